@@ -0,0 +1,105 @@
+"""
+Micro-batching for DriftOS embedding requests
+
+Concurrent /embed, /similarity and /drift calls each carry 1-2 texts, which
+leaves the encoder's matmuls mostly idle. EmbeddingBatcher collects pending
+texts for up to MAX_WAIT_MS (or until MAX_BATCH_SIZE texts are waiting), runs
+one encode over all of them on a worker thread, and hands each caller back
+its own rows.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable
+
+import numpy as np
+
+logger = logging.getLogger("driftos-embed")
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", "5"))
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent encode calls into shared forward passes."""
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue[tuple[list[str], asyncio.Future]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        # Reported by /health, for tuning MAX_WAIT_MS / MAX_BATCH_SIZE
+        self.batches = 0
+        self.texts = 0
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, texts: list[str]) -> np.ndarray:
+        """Queue texts for the next batch and wait for their embeddings."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Drain until the batch is full or the wait window closes. Requests
+            # that queued up during the previous encode are taken without waiting
+            while count < self.max_batch_size:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    batch.append(item)
+                    count += len(item[0])
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                count += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            self.batches += 1
+            self.texts += len(texts)
+            try:
+                # Off the event loop, so requests keep queueing during the forward pass
+                embeddings = await asyncio.to_thread(self._encode, texts)
+            except Exception as exc:
+                logger.exception("Batched encode failed", extra={"batch_size": len(texts)})
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                end = offset + len(item_texts)
+                if not future.done():
+                    future.set_result(embeddings[offset:end])
+                offset = end
@@ -9,10 +9,25 @@ Advanced spaCy-based analysis for conversation drift detection:
 - Topic pivot detection
 """
 
+import functools
+import os
 import re
+import sys
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Optional
-from spacy.tokens import Doc, Token
+from typing import Callable, Optional
+import numpy as np
+from spacy.attrs import IS_STOP, LEMMA, LENGTH, LOWER, POS
+from spacy.matcher import PhraseMatcher
+from spacy.strings import StringStore, hash_string
+from spacy.symbols import (
+    ADJ, ADP, AUX, DET, NOUN, NUM, PART, PRON, PROPN, VERB,
+    attr, dobj, expl, nsubj, nsubjpass, pobj,
+)
+from spacy.tokens import Doc, Span, Token
+
+from preprocessing import get_nlp, parse_batch
 
 
 # Entity type weights - higher = more significant for topic detection
@@ -38,52 +53,173 @@ ENTITY_WEIGHTS = {
 DEFAULT_NOUN_WEIGHT = 1.0
 DEFAULT_PROPN_WEIGHT = 2.0
 
-# Preference/comparison patterns
-PREFERENCE_PATTERNS = re.compile(
-    r'\b(prefer|rather|instead of|better than|over|compared to|versus|vs\.?)\b',
-    re.IGNORECASE
+# Closed word classes checked against token.lower. The *_IDS sets hold the same
+# strings as vocab ids (StringStore hashes are stable across pipelines), so hot
+# loops compare ints instead of building token.lower_ strings
+INTERROGATIVES = frozenset(map(sys.intern, (
+    'who', 'what', 'where', 'when', 'why', 'how', 'which', 'whom', 'whose',
+)))
+AUX_INVERSION = frozenset(map(sys.intern, (
+    'can', 'could', 'would', 'should', 'do', 'does', 'did',
+    'is', 'are', 'was', 'were', 'will', 'have', 'has',
+)))
+DEMONSTRATIVES = frozenset(map(sys.intern, ('this', 'that', 'these', 'those')))
+IT_PRONOUNS = frozenset(map(sys.intern, ('it', 'its')))
+THEY_PRONOUNS = frozenset(map(sys.intern, ('they', 'them', 'their')))
+PREFERENCE_VERBS = frozenset(map(sys.intern, ('prefer', 'rather')))
+PREFERENCE_LINKS = frozenset(map(sys.intern, ('to', 'over', 'than')))
+PLURAL_NOUN_TAGS = frozenset(map(sys.intern, ('NNS', 'NNPS')))
+
+_WORD_IDS = StringStore()
+QUESTION_START_IDS = frozenset(map(_WORD_IDS.add, INTERROGATIVES | AUX_INVERSION))
+DEMONSTRATIVE_IDS = frozenset(map(_WORD_IDS.add, DEMONSTRATIVES))
+IT_PRONOUN_IDS = frozenset(map(_WORD_IDS.add, IT_PRONOUNS))
+THEY_PRONOUN_IDS = frozenset(map(_WORD_IDS.add, THEY_PRONOUNS))
+PREFERENCE_VERB_IDS = frozenset(map(_WORD_IDS.add, PREFERENCE_VERBS))
+PREFERENCE_LINK_IDS = frozenset(map(_WORD_IDS.add, PREFERENCE_LINKS))
+PLURAL_NOUN_TAG_IDS = frozenset(map(_WORD_IDS.add, PLURAL_NOUN_TAGS))
+OVER_ID = _WORD_IDS.add('over')
+IT_ID = _WORD_IDS.add('it')
+
+# Preference extraction: tokens that may form the compared noun phrases, the
+# ones that make a phrase worth reporting, and scaffolding skipped after "prefer"
+NOUN_PHRASE_POS = frozenset({DET, ADJ, NUM, NOUN, PROPN})
+NOUN_PHRASE_CORE_POS = frozenset({ADJ, NUM, NOUN, PROPN})
+PREFERENCE_SKIP_POS = frozenset({AUX, VERB, PART})
+
+# Entities at or above this weight count as high-value
+HIGH_VALUE_WEIGHT = 2.0
+
+# Codes stored in EntityAnalysis.labels: en_core_web_sm NER labels, a catch-all
+# for any other NER label, then the token/chunk fallbacks
+ENTITY_LABELS = (
+    'CARDINAL', 'DATE', 'EVENT', 'FAC', 'GPE', 'LANGUAGE', 'LAW', 'LOC', 'MONEY',
+    'NORP', 'ORDINAL', 'ORG', 'PERCENT', 'PERSON', 'PRODUCT', 'QUANTITY', 'TIME',
+    'WORK_OF_ART', 'ENTITY', 'PROPN', 'NOUN', 'NOUN_CHUNK',
+)
+LABEL_CODES = {label: code for code, label in enumerate(ENTITY_LABELS)}
+
+# Same label -> id mapping as any pipeline's vocab.strings (NER labels are
+# spaCy symbols), so ent.label can be looked up without touching ent.label_
+_LABEL_IDS = StringStore()
+WEIGHT_BY_LABEL_ID = {_LABEL_IDS.add(label): w for label, w in ENTITY_WEIGHTS.items()}
+LABEL_CODE_BY_ID = {_LABEL_IDS.add(label): LABEL_CODES[label] for label in ENTITY_LABELS}
+# Numeric entity types never decide topic overlap - they are dropped before
+# materialization (still marked seen, so later passes don't re-add the text)
+SKIP_LABELS = frozenset({'CARDINAL', 'ORDINAL', 'QUANTITY', 'MONEY', 'PERCENT'})
+SKIP_LABEL_IDS = frozenset(map(_LABEL_IDS.add, SKIP_LABELS))
+ENTITY_CODE = LABEL_CODES['ENTITY']
+PROPN_CODE = LABEL_CODES['PROPN']
+NOUN_CODE = LABEL_CODES['NOUN']
+NOUN_CHUNK_CODE = LABEL_CODES['NOUN_CHUNK']
+
+# Signal phrases. Matched on the parsed doc by a PhraseMatcher (token-aligned,
+# no re-scan of the raw string); the regexes below cover raw-text callers.
+
+# Preference/comparison phrases
+PREFERENCE_PHRASES = (
+    'prefer', 'rather', 'instead of', 'better than', 'over', 'compared to',
+    'versus', 'vs', 'vs.',
+)
+
+# Topic pivot phrases (beyond just "back to")
+TOPIC_PIVOT_PHRASES = (
+    'back to', 'returning to', 'going back to', 'anyway', 'speaking of',
+    'on another note', 'changing topic', 'different subject', 'but about',
+    'so about', 'regarding',
 )
 
-# Topic pivot patterns (beyond just "back to")
-TOPIC_PIVOT_PATTERNS = re.compile(
-    r'\b(back to|returning to|going back to|anyway|speaking of|on another note|'
-    r'changing topic|different subject|but about|so about|regarding)\b',
-    re.IGNORECASE
+# Implicit question phrases (functionally questions without ?)
+IMPLICIT_QUESTION_PHRASES = (
+    'tell me', 'explain', 'describe', 'show me', 'help me understand',
+    'i wonder', "i'm curious", 'wondering if', 'interested to know',
+    'want to know', 'need to know', 'let me know',
 )
 
-# Implicit question patterns (functionally questions without ?)
+
+def _alternation(phrases: tuple[str, ...]) -> str:
+    return '|'.join(re.escape(p) for p in phrases)
+
+
+# Individual patterns, still used directly on raw text by the server
+PREFERENCE_PATTERNS = re.compile(rf'\b({_alternation(PREFERENCE_PHRASES)})\b', re.IGNORECASE)
+TOPIC_PIVOT_PATTERNS = re.compile(rf'\b({_alternation(TOPIC_PIVOT_PHRASES)})\b', re.IGNORECASE)
 IMPLICIT_QUESTION_PATTERNS = re.compile(
-    r'\b(tell me|explain|describe|show me|help me understand|'
-    r'i wonder|i\'m curious|wondering if|interested to know|'
-    r'want to know|need to know|let me know)\b',
-    re.IGNORECASE
+    rf'\b({_alternation(IMPLICIT_QUESTION_PHRASES)})\b', re.IGNORECASE
 )
 
+# PhraseMatcher keys, one per signal family
+SIGNAL_FAMILIES = {
+    'pref': PREFERENCE_PHRASES,
+    'pivot': TOPIC_PIVOT_PHRASES,
+    'implq': IMPLICIT_QUESTION_PHRASES,
+}
 
-@dataclass
-class WeightedEntity:
-    """Entity with weight based on type and context."""
-    text: str
-    lemma: str
-    entity_type: str  # NER label or 'NOUN'/'PROPN'
-    weight: float
-    
-    def __hash__(self):
-        return hash(self.lemma)
-    
-    def __eq__(self, other):
-        return self.lemma == other.lemma
+
+@functools.lru_cache(maxsize=None)
+def _signal_matcher() -> PhraseMatcher:
+    """Build the signal PhraseMatcher once, on the shared pipeline's vocab."""
+    nlp = get_nlp()
+    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    for family, phrases in SIGNAL_FAMILIES.items():
+        matcher.add(family, [nlp.make_doc(p) for p in phrases])
+    return matcher
+
+
+def match_signal_spans(doc: Doc | Span) -> list[tuple[str, int, int]]:
+    """Return (family, start, end) for every signal phrase, in parent-doc token offsets."""
+    strings = doc.vocab.strings
+    return [(strings[match_id], start, end) for match_id, start, end in _signal_matcher()(doc)]
+
+
+def match_signals(doc: Doc | Span) -> frozenset[str]:
+    """Return the signal families ('pref', 'pivot', 'implq') present in doc."""
+    return frozenset(family for family, _, _ in match_signal_spans(doc))
 
 
 @dataclass 
 class EntityAnalysis:
-    """Results of entity extraction with weights."""
-    entities: list[WeightedEntity]
-    total_weight: float
-    high_value_entities: list[str]  # Entities with weight >= 2.0
+    """
+    Results of entity extraction with weights.
     
-    def get_entity_set(self) -> set[str]:
-        return {e.lemma for e in self.entities}
+    Struct-of-arrays: row i of every field describes entity i, so overlap
+    scoring is a handful of vectorized NumPy ops rather than a Python loop.
+    """
+    lemmas: np.ndarray  # uint64 StringStore hashes of the lowercased lemmas
+    weights: np.ndarray  # float64 weights by entity type
+    labels: np.ndarray  # uint8 codes into ENTITY_LABELS
+    names: list[str] = field(default_factory=list)  # Lowercased lemmas
+    texts: list[str] = field(default_factory=list)  # Surface text, for display
+    
+    @classmethod
+    def from_rows(
+        cls,
+        lemmas: list[int],
+        weights: list[float],
+        labels: list[int],
+        names: list[str],
+        texts: list[str]
+    ) -> "EntityAnalysis":
+        return cls(
+            lemmas=np.array(lemmas, dtype=np.uint64),
+            weights=np.array(weights, dtype=np.float64),
+            labels=np.array(labels, dtype=np.uint8),
+            names=names,
+            texts=texts,
+        )
+    
+    @property
+    def total_weight(self) -> float:
+        return float(self.weights.sum())
+    
+    @property
+    def high_value_entities(self) -> list[str]:
+        """Entities with weight >= HIGH_VALUE_WEIGHT."""
+        return [self.names[i] for i in np.flatnonzero(self.weights >= HIGH_VALUE_WEIGHT)]
+    
+    def get_entity_set(self) -> set[int]:
+        """Lemma hashes - integer set ops are cheaper than hashing strings."""
+        return set(self.lemmas.tolist())
 
 
 @dataclass
@@ -118,212 +254,297 @@ class MessageAnalysis:
     rejected_entity: Optional[str] = None
 
 
-def extract_weighted_entities(doc: Doc) -> EntityAnalysis:
+# Lemma hash -> (hash, text) of the lowercased lemma, shared across requests.
+# PROPN lemmas keep their case in spaCy, so .lower() is still needed - but only
+# once per distinct lemma. For already-lowercase lemmas the hash is token.lemma.
+# Hashes come from hash_string rather than strings.add, which would keep every
+# lowercased lemma in the shared vocab for the life of the process.
+_LEMMA_LOWER: dict[int, tuple[int, str]] = {}
+_LEMMA_LOWER_MAX = 50_000
+
+
+def _lemma_key(token: Token) -> tuple[int, str]:
+    key = _LEMMA_LOWER.get(token.lemma)
+    if key is None:
+        if len(_LEMMA_LOWER) >= _LEMMA_LOWER_MAX:
+            _LEMMA_LOWER.clear()
+        lemma = token.lemma_.lower()
+        key = _LEMMA_LOWER[token.lemma] = (hash_string(lemma), lemma)
+    return key
+
+
+def lemma_lower(token: Token) -> str:
+    """token.lemma_.lower(), memoized by lemma hash."""
+    return _lemma_key(token)[1]
+
+
+def extract_weighted_entities(doc: Doc | Span) -> EntityAnalysis:
     """
     Extract entities with weights based on NER type.
     
+    Accepts a full Doc or a sentence Span (spans expose .ents and
+    .noun_chunks directly, so no as_doc() copy is needed).
     Higher weight = more significant for topic detection.
     """
-    entities = []
-    seen_lemmas = set()
+    lemmas: list[int] = []
+    weights: list[float] = []
+    labels: list[int] = []
+    names: list[str] = []
+    texts: list[str] = []
+    seen_lemmas: set[int] = set()
+    
+    def add(lemma_hash: int, lemma: str, text: str, label_code: int, weight: float):
+        lemmas.append(lemma_hash)
+        weights.append(weight)
+        labels.append(label_code)
+        names.append(lemma)
+        texts.append(text)
+        seen_lemmas.add(lemma_hash)
     
     # Named entities from NER
     for ent in doc.ents:
         lemma = ent.text.lower()
-        if lemma not in seen_lemmas and len(lemma) > 2:
-            weight = ENTITY_WEIGHTS.get(ent.label_, 1.0)
-            entities.append(WeightedEntity(
-                text=ent.text,
-                lemma=lemma,
-                entity_type=ent.label_,
-                weight=weight
-            ))
-            seen_lemmas.add(lemma)
-    
-    # Nouns and proper nouns not caught by NER
-    for token in doc:
-        lemma = token.lemma_.lower()
-        if lemma in seen_lemmas or len(lemma) <= 3:
+        if len(lemma) <= 2:
             continue
-        if token.is_stop:
+        lemma_hash = hash_string(lemma)
+        if ent.label in SKIP_LABEL_IDS:
+            seen_lemmas.add(lemma_hash)
+        elif lemma_hash not in seen_lemmas:
+            add(
+                lemma_hash, lemma, ent.text,
+                LABEL_CODE_BY_ID.get(ent.label, ENTITY_CODE),
+                WEIGHT_BY_LABEL_ID.get(ent.label, 1.0)
+            )
+    
+    # Nouns and proper nouns not caught by NER.
+    # Filter POS/stopwords over one attribute array, then visit only the first
+    # token of each distinct lemma - repeats would be skipped as seen anyway.
+    attrs = doc.to_array([LEMMA, POS, IS_STOP])
+    candidates = np.flatnonzero(np.isin(attrs[:, 1], (NOUN, PROPN)) & (attrs[:, 2] == 0))
+    _, first = np.unique(attrs[candidates, 0], return_index=True)
+    for i in candidates[np.sort(first)]:
+        token = doc[int(i)]
+        lemma_hash, lemma = _lemma_key(token)
+        if lemma_hash in seen_lemmas or len(lemma) <= 3:
             continue
             
-        if token.pos_ == 'PROPN':
-            entities.append(WeightedEntity(
-                text=token.text,
-                lemma=lemma,
-                entity_type='PROPN',
-                weight=DEFAULT_PROPN_WEIGHT
-            ))
-            seen_lemmas.add(lemma)
-        elif token.pos_ == 'NOUN':
-            entities.append(WeightedEntity(
-                text=token.text,
-                lemma=lemma,
-                entity_type='NOUN',
-                weight=DEFAULT_NOUN_WEIGHT
-            ))
-            seen_lemmas.add(lemma)
+        if token.pos == PROPN:
+            add(lemma_hash, lemma, token.text, PROPN_CODE, DEFAULT_PROPN_WEIGHT)
+        else:
+            add(lemma_hash, lemma, token.text, NOUN_CODE, DEFAULT_NOUN_WEIGHT)
     
     # Noun chunks for compound nouns
     for chunk in doc.noun_chunks:
         lemma = chunk.text.lower()
-        if lemma not in seen_lemmas and len(lemma) > 4:
+        if len(lemma) <= 4:
+            continue
+        lemma_hash = hash_string(lemma)
+        if lemma_hash not in seen_lemmas:
             # Weight based on whether it contains a proper noun
-            has_propn = any(t.pos_ == 'PROPN' for t in chunk)
+            has_propn = any(t.pos == PROPN for t in chunk)
             weight = DEFAULT_PROPN_WEIGHT if has_propn else DEFAULT_NOUN_WEIGHT
-            entities.append(WeightedEntity(
-                text=chunk.text,
-                lemma=lemma,
-                entity_type='NOUN_CHUNK',
-                weight=weight
-            ))
-            seen_lemmas.add(lemma)
+            add(lemma_hash, lemma, chunk.text, NOUN_CHUNK_CODE, weight)
+    
+    return EntityAnalysis.from_rows(lemmas, weights, labels, names, texts)
+
+
+def merge_entity_analyses(analyses: list[EntityAnalysis]) -> EntityAnalysis:
+    """
+    Union per-sentence entity analyses, deduplicated by lemma.
     
-    total_weight = sum(e.weight for e in entities)
-    high_value = [e.lemma for e in entities if e.weight >= 2.0]
+    Applies the same precedence as extracting from the whole doc at once
+    (NER entities, then single nouns, then noun chunks; earliest first), so the
+    message-level result matches without a second pass over the doc.
+    """
+    lemmas = np.concatenate([a.lemmas for a in analyses] or [np.empty(0, np.uint64)])
+    weights = np.concatenate([a.weights for a in analyses] or [np.empty(0)])
+    labels = np.concatenate([a.labels for a in analyses] or [np.empty(0, np.uint8)])
+    names = [name for a in analyses for name in a.names]
+    texts = [text for a in analyses for text in a.texts]
+    
+    # Tier 0 = NER labels, 1 = single nouns, 2 = noun chunks.
+    # A stable sort keeps sentence order within each tier, so the first
+    # occurrence of each lemma in that order is the one to keep.
+    tiers = (labels >= PROPN_CODE).astype(np.int8) + (labels == NOUN_CHUNK_CODE)
+    order = np.argsort(tiers, kind='stable')
+    _, first = np.unique(lemmas[order], return_index=True)
+    keep = order[np.sort(first)]
     
     return EntityAnalysis(
-        entities=entities,
-        total_weight=total_weight,
-        high_value_entities=high_value
+        lemmas=lemmas[keep],
+        weights=weights[keep],
+        labels=labels[keep],
+        names=[names[i] for i in keep.tolist()],
+        texts=[texts[i] for i in keep.tolist()],
     )
 
 
-def has_anaphoric_reference(doc: Doc) -> bool:
+def has_anaphoric_reference(doc: Doc | Span) -> bool:
     """
     Detect anaphoric references using spaCy POS tagging.
     
     Only returns True if the pronoun likely refers to PREVIOUS context,
     not something mentioned in the same sentence.
-    """
-    # First, collect all nouns in the message that pronouns could refer to
-    local_referents = set()
-    for token in doc:
-        if token.pos_ in ('NOUN', 'PROPN'):
-            local_referents.add(token.lemma_.lower())
     
-    for token in doc:
+    Single pass: demonstratives decide immediately, while it/they candidates
+    are resolved at the end against whether the message has any (plural) noun.
+    """
+    has_noun = False  # A local referent "it" could point to
+    has_plural_noun = False  # A local referent "they" could point to
+    it_candidate = False
+    they_candidate = False
+    
+    # Enumerate instead of token.i - for a Span, token.i is the index in the parent Doc
+    for i, token in enumerate(doc):
+        pos = token.pos
+        if pos == NOUN or pos == PROPN:
+            has_noun = True
+        if token.tag in PLURAL_NOUN_TAG_IDS:
+            has_plural_noun = True
+        
+        lower = token.lower
         # Demonstratives as subject/object at START of message
         # "That's cool" vs "I think that's wrong" (different)
-        if token.text.lower() in {'this', 'that', 'these', 'those'}:
+        if lower in DEMONSTRATIVE_IDS:
             # Only count if it's near the start (first 3 tokens) or is the subject
-            if token.i <= 2 or token.dep_ in ('nsubj', 'nsubjpass'):
-                if token.dep_ in ('nsubj', 'nsubjpass', 'dobj', 'pobj', 'attr'):
+            if i <= 2 or token.dep in (nsubj, nsubjpass):
+                if token.dep in (nsubj, nsubjpass, dobj, pobj, attr):
                     return True
-                if token.pos_ == 'PRON':
+                if pos == PRON:
                     return True
         
         # Personal pronouns - but only if there's no local referent
         # "my car, it's making noise" - "it" refers to "car" (local)
         # "it's really cool" - "it" likely refers to previous context
-        if token.text.lower() in {'it', 'its'}:
-            if token.text.lower() == 'it' and token.dep_ == 'expl':
-                continue
-            # If there's a noun in the message, "it" probably refers to that
-            if local_referents:
+        elif lower in IT_PRONOUN_IDS:
+            if lower == IT_ID and token.dep == expl:
                 continue
-            if token.pos_ in ('PRON', 'DET'):
-                return True
+            if pos == PRON or pos == DET:
+                it_candidate = True
         
         # "they/them" usually refers to previous context if no plural noun present
-        if token.text.lower() in {'they', 'them', 'their'}:
-            if token.pos_ in ('PRON', 'DET'):
-                # Check if there's a plural noun locally
-                has_plural = any(
-                    t.tag_ in ('NNS', 'NNPS') for t in doc
-                )
-                if not has_plural:
-                    return True
+        elif lower in THEY_PRONOUN_IDS:
+            if pos == PRON or pos == DET:
+                they_candidate = True
     
-    return False
+    # If there's a noun in the message, "it" probably refers to that
+    return (it_candidate and not has_noun) or (they_candidate and not has_plural_noun)
 
 
-def is_question(doc: Doc, raw_text: str) -> bool:
+def is_question(
+    doc: Doc | Span,
+    raw_text: str,
+    signals: Optional[frozenset[str]] = None
+) -> bool:
     """
     Detect questions - explicit and implicit.
+    
+    Pass `signals` from match_signals() to reuse an existing match over doc.
     """
     # Explicit question mark
     if '?' in raw_text:
         return True
     
-    # Interrogative words at start
-    interrogatives = {'who', 'what', 'where', 'when', 'why', 'how', 'which', 'whom', 'whose'}
-    if doc and len(doc) > 0:
-        first_word = doc[0].text.lower()
-        if first_word in interrogatives:
-            return True
-        # Aux verb inversion
-        if first_word in {'can', 'could', 'would', 'should', 'do', 'does', 'did', 
-                          'is', 'are', 'was', 'were', 'will', 'have', 'has'}:
-            return True
+    # Interrogative words or aux verb inversion at start
+    if len(doc) > 0 and doc[0].lower in QUESTION_START_IDS:
+        return True
     
     # Implicit questions ("tell me about", "I wonder")
-    if IMPLICIT_QUESTION_PATTERNS.search(raw_text):
+    if signals is None:
+        signals = match_signals(doc)
+    if 'implq' in signals:
         return True
     
     return False
 
 
-def detect_preference(doc: Doc, raw_text: str) -> tuple[bool, Optional[str], Optional[str]]:
+def detect_preference(
+    doc: Doc | Span,
+    raw_text: str,
+    signals: Optional[frozenset[str]] = None
+) -> tuple[bool, Optional[str], Optional[str]]:
     """
     Detect preference/comparison statements and extract what's preferred vs rejected.
     
     "I prefer black holes to donald trump"
     -> preferred: "black holes", rejected: "donald trump"
     """
-    if not PREFERENCE_PATTERNS.search(raw_text):
+    if signals is None:
+        signals = match_signals(doc)
+    if 'pref' not in signals:
         return False, None, None
     
     preferred = None
     rejected = None
-    
-    # Look for "prefer X to Y" or "X over Y" patterns
-    for token in doc:
-        if token.text.lower() in {'prefer', 'rather'}:
-            # Object of prefer is the preferred thing
-            for child in token.children:
-                if child.dep_ == 'dobj':
-                    # Get the full noun phrase
-                    preferred = get_noun_phrase(child)
-                elif child.dep_ == 'prep' and child.text.lower() == 'to':
-                    # Object of "to" is the rejected thing
-                    for pobj in child.children:
-                        if pobj.dep_ == 'pobj':
-                            rejected = get_noun_phrase(pobj)
+    n = len(doc)
+    
+    def phrase_after(k: int) -> tuple[int, int]:
+        """Longest run of noun-phrase tokens starting at k."""
+        end = k
+        while end < n and doc[end].pos in NOUN_PHRASE_POS:
+            end += 1
+        return k, end
+    
+    def phrase_text(start: int, end: int) -> Optional[str]:
+        if any(doc[k].pos in NOUN_PHRASE_CORE_POS for k in range(start, end)):
+            return doc[start:end].text
+        return None
+    
+    # Left-to-right scan for "prefer X to Y" / "rather X than Y" / "X over Y"
+    i = 0
+    while i < n:
+        lower = doc[i].lower
+        if lower in PREFERENCE_VERB_IDS:
+            # Skip verb scaffolding: "prefer to visit X", "rather have X"
+            j = i + 1
+            while j < n and doc[j].pos in PREFERENCE_SKIP_POS:
+                j += 1
+            start, end = phrase_after(j)
+            phrase = phrase_text(start, end)
+            if phrase:
+                # The thing being preferred
+                preferred = phrase
+                # "... to/over/than Y" - Y is the rejected thing
+                if end < n and doc[end].lower in PREFERENCE_LINK_IDS:
+                    start, end = phrase_after(end + 1)
+                    rejected = phrase_text(start, end) or rejected
+                i = max(end, i + 1)
+                continue
         
         # Handle "X over Y" pattern
-        if token.text.lower() == 'over' and token.dep_ == 'prep':
-            for pobj in token.children:
-                if pobj.dep_ == 'pobj':
-                    rejected = get_noun_phrase(pobj)
+        elif lower == OVER_ID and doc[i].pos == ADP:
+            after = phrase_text(*phrase_after(i + 1))
             # The thing before "over" is preferred
-            if token.head.pos_ in ('NOUN', 'PROPN'):
-                preferred = get_noun_phrase(token.head)
+            start = i
+            while start > 0 and doc[start - 1].pos in NOUN_PHRASE_POS:
+                start -= 1
+            if after:
+                rejected = after
+                if start < i and doc[i - 1].pos in (NOUN, PROPN):
+                    preferred = doc[start:i].text
+        i += 1
     
     return True, preferred, rejected
 
 
-def get_noun_phrase(token: Token) -> str:
-    """Extract full noun phrase from a token."""
-    # Get all tokens in the subtree
-    phrase_tokens = list(token.subtree)
-    # Sort by position and join
-    phrase_tokens.sort(key=lambda t: t.i)
-    return ' '.join(t.text for t in phrase_tokens).strip()
-
-
-def analyze_sentence(doc: Doc, raw_text: str) -> SentenceAnalysis:
+def analyze_sentence(
+    doc: Doc | Span,
+    raw_text: str,
+    signals: Optional[frozenset[str]] = None
+) -> SentenceAnalysis:
     """Analyze a single sentence."""
     entities = extract_weighted_entities(doc)
-    has_pref, preferred, rejected = detect_preference(doc, raw_text)
+    # One match covers preference, pivot and implicit-question phrases
+    if signals is None:
+        signals = match_signals(doc)
+    has_pref, preferred, rejected = detect_preference(doc, raw_text, signals)
     
     return SentenceAnalysis(
         text=raw_text,
-        is_question=is_question(doc, raw_text),
+        is_question=is_question(doc, raw_text, signals),
         has_anaphoric_ref=has_anaphoric_reference(doc),
         has_preference=has_pref,
-        has_topic_pivot=bool(TOPIC_PIVOT_PATTERNS.search(raw_text)),
+        has_topic_pivot='pivot' in signals,
         entities=entities,
         preferred_entity=preferred,
         rejected_entity=rejected
@@ -337,14 +558,22 @@ def analyze_message(doc: Doc, raw_text: str) -> MessageAnalysis:
     # Split into sentences
     sentences = list(doc.sents)
     
+    # Match signal phrases once over the whole doc, then bucket per sentence
+    signal_spans = match_signal_spans(doc)
+    
+    # Analyze each sentence as a Span of the parsed doc - sent.as_doc() would
+    # re-serialize the whole parent Doc per sentence
     sentence_analyses = []
     for sent in sentences:
-        sent_doc = sent.as_doc()
-        sent_analysis = analyze_sentence(sent_doc, sent.text)
+        signals = frozenset(
+            family for family, start, end in signal_spans
+            if start >= sent.start and end <= sent.end
+        )
+        sent_analysis = analyze_sentence(sent, sent.text, signals)
         sentence_analyses.append(sent_analysis)
     
-    # Aggregate analysis
-    all_entities = extract_weighted_entities(doc)
+    # Aggregate analysis - sentence entities are merged rather than re-extracted
+    all_entities = merge_entity_analyses([s.entities for s in sentence_analyses])
     is_q = any(s.is_question for s in sentence_analyses)
     has_anaph = any(s.has_anaphoric_ref for s in sentence_analyses)
     has_pref = any(s.has_preference for s in sentence_analyses)
@@ -393,6 +622,153 @@ def analyze_message(doc: Doc, raw_text: str) -> MessageAnalysis:
     )
 
 
+class TextLRU:
+    """
+    Thread-safe LRU of per-text results, filled a batch of misses at a time.
+    
+    Texts longer than max_len are computed but not stored, so one-off long
+    documents don't evict the short turns that actually repeat.
+    """
+    
+    def __init__(self, size: int, max_len: int):
+        self.size = size
+        self.max_len = max_len
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def map(self, texts: list[str], compute: Callable[[list[str]], list]) -> list:
+        """Look up each text, calling compute() once for all of the misses."""
+        results = [None] * len(texts)
+        misses = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                hit = self._items.get(text)
+                if hit is None:
+                    misses.append(i)
+                else:
+                    self._items.move_to_end(text)
+                    results[i] = hit
+        if not misses:
+            return results
+        
+        for i, value in zip(misses, compute([texts[i] for i in misses])):
+            results[i] = value
+        
+        if self.size > 0:
+            with self._lock:
+                for i in misses:
+                    if len(texts[i]) <= self.max_len:
+                        self._items[texts[i]] = results[i]
+                        self._items.move_to_end(texts[i])
+                while len(self._items) > self.size:
+                    self._items.popitem(last=False)
+        return results
+
+
+# MessageAnalysis results memoized by raw text. In a chat loop the "previous"
+# message of one turn is the "current" of the turn before, so half of every
+# /analyze-* request is a repeat. Cached results are shared - treat them as
+# read-only. 0 disables the cache
+ANALYSIS_CACHE_SIZE = int(os.getenv("DRIFTOS_ANALYSIS_CACHE", "2048"))
+ANALYSIS_CACHE_MAX_LEN = 2000
+
+_analysis_cache = TextLRU(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_MAX_LEN)
+_overlap_entity_cache = TextLRU(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_MAX_LEN)
+
+
+def _analyze_uncached(texts: list[str]) -> list[MessageAnalysis]:
+    return [analyze_message(doc, text) for doc, text in zip(parse_batch(texts), texts)]
+
+
+def analyze_texts(texts: list[str]) -> list[MessageAnalysis]:
+    """
+    analyze_message() over raw texts, serving repeats from the LRU.
+    
+    Misses are parsed together in one nlp.pipe call.
+    """
+    return _analysis_cache.map(texts, _analyze_uncached)
+
+
+def extract_overlap_entities(doc: Doc) -> tuple[str, ...]:
+    """
+    Unweighted entity strings for /entity-overlap: NER spans, long nouns and
+    proper nouns, and noun chunks plus their long non-stopword tokens. Each
+    token contributes both its lowercased lemma and its lowercased text.
+    
+    Without repeats, in the order found: NER spans, then noun chunks, then
+    tokens, each in text order.
+    """
+    # A dict as an insertion-ordered set
+    entities = dict.fromkeys(ent.text.lower() for ent in doc.ents)
+    
+    # The token filters run as masks over the attribute array; only selected
+    # tokens are turned back into strings
+    attrs = doc.to_array([POS, LEMMA, LOWER, LENGTH, IS_STOP])
+    is_long = attrs[:, 3] > 3
+    keep = is_long & np.isin(attrs[:, 0], (NOUN, PROPN))
+    
+    # Noun chunks (compound nouns like "serpentine belt"). All of a chunk's
+    # words count, not just nouns - catches adjectives like "serpentine"
+    in_chunk = np.zeros(len(doc), dtype=bool)
+    for chunk in doc.noun_chunks:
+        if chunk.end_char - chunk.start_char > 3:
+            entities.setdefault(chunk.text.lower())
+            in_chunk[chunk.start:chunk.end] = True
+    keep |= in_chunk & is_long & (attrs[:, 4] == 0)
+    
+    strings = doc.vocab.strings
+    for lemma_id, lower_id in attrs[keep][:, 1:3].tolist():
+        entities.setdefault(strings[lemma_id].lower())
+        entities.setdefault(strings[lower_id])
+    return tuple(entities)
+
+
+def _overlap_entities_uncached(texts: list[str]) -> list[tuple[str, ...]]:
+    return [extract_overlap_entities(doc) for doc in parse_batch(texts)]
+
+
+def overlap_entities(texts: list[str]) -> list[tuple[str, ...]]:
+    """extract_overlap_entities() over lowercased texts, cached like analyze_texts."""
+    return _overlap_entity_cache.map([text.lower() for text in texts], _overlap_entities_uncached)
+
+
+@dataclass
+class OverlapStats:
+    """Per-pair reductions shared by overlap scoring and floor suppression."""
+    shared_mask: np.ndarray  # bool per current entity: also in previous
+    shared_weight: float
+    new_weight: float
+    high_value_new: int  # New entities with weight >= HIGH_VALUE_WEIGHT
+
+
+def entity_overlap_stats(
+    current_entities: EntityAnalysis,
+    previous_entities: EntityAnalysis
+) -> OverlapStats:
+    """
+    Compute every overlap reduction in one pass over the current entities.
+    
+    Membership is a binary search into the sorted previous lemmas; the masked
+    sums and the high-value count all reuse that single mask.
+    """
+    lemmas = current_entities.lemmas
+    weights = current_entities.weights
+    previous = np.sort(previous_entities.lemmas)
+    
+    shared_mask = np.zeros(len(lemmas), dtype=bool)
+    if len(previous):
+        idx = np.minimum(np.searchsorted(previous, lemmas), len(previous) - 1)
+        shared_mask = previous[idx] == lemmas
+    new_mask = ~shared_mask
+    
+    return OverlapStats(
+        shared_mask=shared_mask,
+        shared_weight=float(weights[shared_mask].sum()),
+        new_weight=float(weights[new_mask].sum()),
+        high_value_new=int((weights[new_mask] >= HIGH_VALUE_WEIGHT).sum()),
+    )
+
+
 def calculate_entity_overlap(
     current_entities: EntityAnalysis, 
     previous_entities: EntityAnalysis
@@ -402,30 +778,17 @@ def calculate_entity_overlap(
     
     Returns: (overlap_score, shared_entities, new_entity_weight)
     """
-    current_set = current_entities.get_entity_set()
-    previous_set = previous_entities.get_entity_set()
-    
-    shared = current_set & previous_set
-    new_entities = current_set - previous_set
-    
-    # Calculate weighted overlap
-    shared_weight = sum(
-        e.weight for e in current_entities.entities 
-        if e.lemma in shared
-    )
-    
-    new_weight = sum(
-        e.weight for e in current_entities.entities
-        if e.lemma in new_entities
-    )
+    stats = entity_overlap_stats(current_entities, previous_entities)
+    shared = {current_entities.names[i] for i in np.flatnonzero(stats.shared_mask)}
     
     # Overlap score based on weights
-    if current_entities.total_weight == 0:
+    total_weight = stats.shared_weight + stats.new_weight
+    if total_weight == 0:
         overlap_score = 0.0
     else:
-        overlap_score = shared_weight / current_entities.total_weight
+        overlap_score = stats.shared_weight / total_weight
     
-    return overlap_score, shared, new_weight
+    return overlap_score, shared, stats.new_weight
 
 
 def should_suppress_anaphoric_floor(
@@ -451,26 +814,14 @@ def should_suppress_anaphoric_floor(
         return True
     
     # Check for significant new entities
-    current_set = current_analysis.all_entities.get_entity_set()
-    previous_set = previous_entities.get_entity_set()
-    new_entities = current_set - previous_set
-    
-    # Calculate weight of new entities
-    new_weight = sum(
-        e.weight for e in current_analysis.all_entities.entities
-        if e.lemma in new_entities
-    )
+    stats = entity_overlap_stats(current_analysis.all_entities, previous_entities)
     
     # If new entities have high weight, suppress floor
-    if new_weight >= 4.0:  # e.g., one PERSON + one GPE
+    if stats.new_weight >= 4.0:  # e.g., one PERSON + one GPE
         return True
     
     # If multiple high-value new entities
-    high_value_new = [
-        e for e in current_analysis.all_entities.entities
-        if e.lemma in new_entities and e.weight >= 2.0
-    ]
-    if len(high_value_new) >= 2:
+    if stats.high_value_new >= 2:
         return True
     
     return False
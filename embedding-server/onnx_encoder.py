@@ -0,0 +1,194 @@
+"""
+ONNX Runtime encoder for DriftOS
+
+Drop-in replacement for the SentenceTransformer calls the server makes
+(encode + get_sentence_embedding_dimension), backed by an INT8 dynamically
+quantized ONNX export of the same model:
+- Prebuilt quantized graph from the model's Hub repo when it ships one
+  (sentence-transformers models do), else exported and quantized once locally
+- Mean pooling over the attention mask (what paraphrase-MiniLM-L6-v2 uses)
+- CPU only - fused ORT kernels + int8 GEMMs beat the PyTorch graph there
+
+Needs the optional `optimum[onnxruntime]` install (onnxruntime alone is enough
+when a prebuilt file exists); imported lazily so the default torch backend
+works without it.
+"""
+
+import logging
+import os
+import platform
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("driftos-embed")
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "driftos-embed" / "onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def _is_arm() -> bool:
+    # arm64 (Apple Silicon, Graviton) has no VNNI; int8 configs differ
+    return platform.machine().lower() in ("arm64", "aarch64")
+
+
+def _download_prebuilt(model_name: str) -> Path | None:
+    """Fetch the Hub repo's prebuilt dynamic-int8 ONNX file, if it has one."""
+    file_name = "model_qint8_arm64.onnx" if _is_arm() else "model_qint8_avx512_vnni.onnx"
+    try:
+        from huggingface_hub import hf_hub_download
+
+        return Path(hf_hub_download(model_name, f"onnx/{file_name}"))
+    except Exception:
+        logger.info("No prebuilt quantized ONNX file", extra={"model": model_name, "file": file_name})
+        return None
+
+
+def _export_quantized(model_name: str, out_dir: Path) -> Path:
+    """Export model_name to ONNX and write a dynamically quantized INT8 copy."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    logger.info("Exporting model to ONNX", extra={"model": model_name, "path": str(out_dir)})
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(out_dir)
+
+    if _is_arm():
+        qconfig = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    else:
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    ORTQuantizer.from_pretrained(out_dir).quantize(save_dir=out_dir, quantization_config=qconfig)
+    return out_dir / QUANTIZED_FILE
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible encoder running a quantized ONNX graph."""
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str | None = None,
+        max_seq_length: int = 128,
+        threads: int | None = None,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        out_dir = Path(cache_dir or DEFAULT_CACHE_DIR) / model_name.replace("/", "--")
+        model_path = out_dir / QUANTIZED_FILE
+        if not model_path.exists():
+            model_path = _download_prebuilt(model_name) or _export_quantized(model_name, out_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # sentence-transformers truncates MiniLM at 128 tokens; match it so both
+        # backends embed long texts the same way
+        self.max_seq_length = min(max_seq_length, self.tokenizer.model_max_length)
+        self._output_name = self.session.get_outputs()[0].name
+        self._pad_id = self.tokenizer.pad_token_id or 0
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+        if not isinstance(self._dimension, int):
+            # Exported graphs can leave the hidden size symbolic (a name, or
+            # None); take it from the model config, else from a one-token run
+            hidden_size = getattr(AutoConfig.from_pretrained(model_name), "hidden_size", None)
+            self._dimension = hidden_size if isinstance(hidden_size, int) else self._probe_dimension()
+
+        # Flat input/output buffers reused across calls. Each sub-batch takes a
+        # contiguous view of the front, so ORT gets dense arrays without a
+        # fresh allocation per request, and writes its output through an
+        # IOBinding into the (batch, seq, dim) buffer. Grown on demand
+        self._buffers: dict[str, np.ndarray] = {}
+        self._binding = self.session.io_binding()
+        self._lock = threading.Lock()
+
+    def _probe_dimension(self) -> int:
+        """Embedding size from running the graph on a single token."""
+        # One padding token, attended to; token_type_ids stay 0
+        fill = {"input_ids": self._pad_id, "attention_mask": 1}
+        feeds = {name: np.full((1, 1), fill.get(name, 0), dtype=np.int64) for name in self.input_names}
+        return int(self.session.run([self._output_name], feeds)[0].shape[-1])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: str | list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **_: object,
+    ) -> np.ndarray:
+        """Embed sentences as a float32 (n, dim) array, like SentenceTransformer.encode."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self._dimension), dtype=np.float32)
+
+        # Tokenize once unpadded, then batch by length so each sub-batch only
+        # pads up to its own longest text rather than the longest overall
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_seq_length)
+        lengths = np.fromiter(map(len, encoded["input_ids"]), dtype=np.int64, count=len(texts))
+        order = np.argsort(-lengths, kind="stable")
+
+        embeddings = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            features = {key: [values[i] for i in idx] for key, values in encoded.items()}
+            embeddings[idx] = self._encode_batch(features)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
+
+    def _buffer_view(self, name: str, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+        """A contiguous view of the given shape over a reusable flat buffer."""
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            # Sized for a 64-text batch of full-length sequences up front
+            minimum = 64 * self.max_seq_length * int(np.prod(shape[2:]))
+            buffer = self._buffers[name] = np.empty(max(size, minimum), dtype=dtype)
+        return buffer[:size].reshape(shape)
+
+    def _encode_batch(self, features: dict[str, list[list[int]]]) -> np.ndarray:
+        """Pad one length-sorted sub-batch to its longest text and mean-pool it."""
+        input_ids = features["input_ids"]
+        rows, cols = len(input_ids), max(map(len, input_ids))
+
+        with self._lock:
+            binding = self._binding
+            views = {}
+            for name in self.input_names:
+                view = self._buffer_view(name, (rows, cols), np.int64)
+                view.fill(self._pad_id if name == "input_ids" else 0)
+                # Missing token_type_ids stay all zeros (single-segment input)
+                for r, values in enumerate(features.get(name, ())):
+                    view[r, :len(values)] = values
+                binding.bind_cpu_input(name, view)
+                views[name] = view
+            token_embeddings = self._buffer_view(
+                self._output_name, (rows, cols, self._dimension), np.float32
+            )
+            binding.bind_output(
+                self._output_name,
+                device_type="cpu",
+                element_type=np.float32,
+                shape=token_embeddings.shape,
+                buffer_ptr=token_embeddings.ctypes.data,
+            )
+            self.session.run_with_iobinding(binding)
+            mask = views["attention_mask"].astype(np.float32)
+
+            # Mean pooling over real (non-padding) tokens, done before the lock
+            # is released since the output buffer is shared. einsum masks and
+            # sums in one pass, with no masked temporary
+            pooled = np.einsum("bsd,bs->bd", token_embeddings, mask)
+        pooled /= np.maximum(mask.sum(axis=1, keepdims=True), 1e-9)
+        return pooled
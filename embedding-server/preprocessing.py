@@ -5,22 +5,88 @@ Uses spaCy for lemmatization + custom stopword removal.
 Produces cleaner embeddings with better semantic separation.
 """
 
-import re
-from typing import List
+import functools
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List
+import numpy as np
 import spacy
+from spacy.attrs import IS_PUNCT, IS_SPACE, LEMMA
+from spacy.strings import StringStore
+from spacy.tokens import Doc
+
+SPACY_MODEL = "en_core_web_sm"
+
+# preprocess() only reads tagger-driven lemmas; the parser and NER are skipped
+# per call so it can share one loaded pipeline with nlp_analysis
+PREPROCESS_DISABLE = ["parser", "ner"]
+
+# nlp.pipe tuning. n_process > 1 only pays off for large batches - worker
+# startup dominates for the short chat turns this server usually sees
+SPACY_BATCH_SIZE = int(os.getenv("DRIFTOS_SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.getenv("DRIFTOS_SPACY_NPROC", "1"))
+
+# Upper bound on characters handed to spaCy. Longer input is truncated rather
+# than rejected, so one huge request can't balloon parser memory
+SPACY_MAX_LENGTH = 100_000
+
+# preprocess results memoized by cleaned text. Chat turns repeat a lot ("ok",
+# "thanks", greetings), and /drift resends the same anchor every call; texts
+# past the length limit are not cached so one-off documents don't evict them.
+# The limit sits above typical anchor paragraphs. 0 disables the cache
+PREPROCESS_CACHE_SIZE = int(os.getenv("DRIFTOS_PREPROCESS_CACHE", "4096"))
+PREPROCESS_CACHE_MAX_LEN = int(os.getenv("DRIFTOS_PREPROCESS_CACHE_MAX_LEN", "1024"))
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def get_nlp() -> spacy.Language:
+    """
+    Load the shared spaCy pipeline (small is fast, good enough for lemmatization).
+
+    Loaded lazily and cached, so preprocessing and entity analysis use a single
+    copy of the model weights instead of two independently loaded pipelines.
+    The lemmatizer and attribute_ruler stay enabled: lemmas and coarse POS tags
+    are read by both preprocess() and nlp_analysis.
+    """
+    try:
+        nlp = spacy.load(SPACY_MODEL)
+    except OSError:
+        import subprocess
+        import logging
+        logging.getLogger("preprocessing").info("Downloading spaCy model...")
+        subprocess.run(["python", "-m", "spacy", "download", SPACY_MODEL])
+        nlp = spacy.load(SPACY_MODEL)
+    
+    nlp.max_length = SPACY_MAX_LENGTH
+    
+    # Run a couple of throwaway docs so the first request doesn't pay for
+    # lazy allocations inside the pipeline components
+    try:
+        for _ in nlp.pipe(["warmup sentence"] * 2, batch_size=2):
+            pass
+    except Exception:
+        import logging
+        logging.getLogger("preprocessing").warning("spaCy warmup failed", exc_info=True)
+    return nlp
+
+
+def parse(text: str) -> Doc:
+    """Run the full shared pipeline, truncating input past SPACY_MAX_LENGTH."""
+    return get_nlp()(text[:SPACY_MAX_LENGTH])
+
+
+def parse_batch(texts: List[str]) -> List[Doc]:
+    """parse() for several texts in one nlp.pipe call (e.g. both sides of a turn)."""
+    return list(get_nlp().pipe(
+        (text[:SPACY_MAX_LENGTH] for text in texts),
+        batch_size=max(len(texts), 1),
+    ))
 
-# Load spaCy model (small is fast, good enough for lemmatization)
-try:
-    nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
-    # Full pipeline for entity extraction (used by /entity-overlap endpoint)
-    nlp_full = spacy.load("en_core_web_sm")
-except OSError:
-    import subprocess
-    import logging
-    logging.getLogger("preprocessing").info("Downloading spaCy model...")
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
-    nlp_full = spacy.load("en_core_web_sm")
 
 # Words to completely remove (don't contribute to topic)
 REMOVE_WORDS = {
@@ -52,6 +118,17 @@ REMOVE_WORDS = {
 }
 
 
+# REMOVE_WORDS as lemma ids. StringStore hashes match any pipeline's vocab.
+# Case variants are included because lemmas keep case for proper nouns and
+# for "I"
+REMOVE_HASHES = frozenset(
+    StringStore().add(variant)
+    for word in REMOVE_WORDS
+    for variant in (word, word.upper(), word.capitalize())
+)
+_REMOVE_HASH_ARRAY = np.fromiter(REMOVE_HASHES, dtype=np.uint64)
+
+
 def preprocess(text: str) -> str:
     """
     Preprocess text for drift-optimized embeddings.
@@ -62,87 +139,138 @@ def preprocess(text: str) -> str:
     3. Lemmatize (verbs → base, nouns → singular)
     4. Remove stopwords/fillers
     
+    Single texts go through preprocess_batch so there is exactly one code path.
+    
     Args:
         text: Raw input text
         
     Returns:
         Preprocessed text with only topic-bearing lemmas
     """
-    if not text or not text.strip():
+    return preprocess_batch([text])[0]
+
+
+class _PunctTable(dict):
+    """
+    str.translate table mapping every non-word, non-space character to a space
+    (the regex class [^\w\s]). Filled lazily per code point, so it works for
+    any Unicode input without prebuilding a table for all of it.
+    """
+
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        value = codepoint if char.isalnum() or char == "_" or char.isspace() else " "
+        self[codepoint] = value
+        return value
+
+
+_PUNCT_TABLE = _PunctTable()
+
+
+def clean_text(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace before spaCy sees the text."""
+    # split() drops leading/trailing whitespace and collapses runs in one C pass
+    if not text:
         return ""
+    # The first cut only bounds lower/translate work. Lowercasing can lengthen
+    # text ("İ" becomes two code points), so the limit is applied again after
+    cleaned = " ".join(text[:SPACY_MAX_LENGTH].lower().translate(_PUNCT_TABLE).split())
+    return cleaned[:SPACY_MAX_LENGTH]
+
+
+def filter_lemmas(doc: Doc, cleaned: str) -> str:
+    """
+    Reduce a parsed Doc to its topic-bearing lemmas.
     
-    # Lowercase and clean punctuation
-    text = text.lower()
-    text = re.sub(r"[^\w\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    
-    # Process with spaCy
-    doc = nlp(text)
-    
-    # Extract lemmas, filter stopwords
+    `cleaned` is the source text after clean_text(), used for the fallback when the
+    lemma filter leaves fewer than two words.
+    """
+    # Filter over the Doc's token attribute array: stopword ids, punctuation
+    # and whitespace are rejected in one vectorized pass, and only surviving
+    # tokens build a lowercased lemma string
+    attrs = doc.to_array([LEMMA, IS_PUNCT, IS_SPACE])
+    keep = attrs[:, 0][
+        (attrs[:, 1] == 0) & (attrs[:, 2] == 0) & ~np.isin(attrs[:, 0], _REMOVE_HASH_ARRAY)
+    ]
+    strings = doc.vocab.strings
     lemmas = []
-    for token in doc:
-        lemma = token.lemma_.lower()
-        # Skip if: stopword, too short, or in our remove list
-        if (
-            lemma not in REMOVE_WORDS 
-            and len(lemma) > 1 
-            and not token.is_punct
-            and not token.is_space
-        ):
+    for lemma_id in keep.tolist():
+        lemma = strings[lemma_id].lower()
+        # Skip if: too short, or in our remove list under another casing
+        if len(lemma) > 1 and lemma not in REMOVE_WORDS:
             lemmas.append(lemma)
     
-    result = " ".join(lemmas)
-    
     # Fallback if too aggressive
     if len(lemmas) < 2:
         basic_filter = {'um', 'uh', 'like', 'just', 'really', 'actually', 'basically'}
-        tokens = text.split()
+        tokens = cleaned.split()
         filtered = [t for t in tokens if t not in basic_filter and len(t) > 1]
-        result = " ".join(filtered)
+        return " ".join(filtered)
     
-    return result
+    return " ".join(lemmas)
 
 
 def preprocess_batch(texts: List[str]) -> List[str]:
     """Preprocess multiple texts using spaCy pipe for efficiency."""
-    if not texts:
-        return []
+    return list(iter_preprocess(texts))
+
+
+def iter_preprocess(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Lazily preprocess a stream of texts, yielding results in input order.
     
+    Input is consumed SPACY_BATCH_SIZE texts at a time, so memory stays bounded
+    by one chunk and consumers can start on early results while later chunks
+    are still being parsed.
+    """
+    texts = iter(texts)
+    while chunk := list(itertools.islice(texts, SPACY_BATCH_SIZE)):
+        yield from _preprocess_chunk(chunk)
+
+
+def _preprocess_chunk(texts: List[str]) -> List[str]:
+    """Preprocess one chunk: cache lookups, then a single nlp.pipe over the misses."""
     # Clean texts first
-    cleaned = []
-    for text in texts:
-        if not text or not text.strip():
-            cleaned.append("")
-        else:
-            text = text.lower()
-            text = re.sub(r"[^\w\s]", " ", text)
-            text = re.sub(r"\s+", " ", text).strip()
-            cleaned.append(text)
+    cleaned = [clean_text(text) for text in texts]
     
-    # Batch process with spaCy pipe
-    results = []
-    for doc in nlp.pipe(cleaned, batch_size=50):
-        lemmas = []
-        for token in doc:
-            lemma = token.lemma_.lower()
-            if (
-                lemma not in REMOVE_WORDS 
-                and len(lemma) > 1 
-                and not token.is_punct
-                and not token.is_space
-            ):
-                lemmas.append(lemma)
-        
-        result = " ".join(lemmas)
-        
-        # Fallback
-        if len(lemmas) < 2:
-            basic_filter = {'um', 'uh', 'like', 'just', 'really', 'actually', 'basically'}
-            tokens = doc.text.split()
-            filtered = [t for t in tokens if t not in basic_filter and len(t) > 1]
-            result = " ".join(filtered)
-        
-        results.append(result)
+    # Serve repeats from the cache; only misses go through spaCy
+    results = [""] * len(cleaned)
+    misses = []
+    with _cache_lock:
+        for i, text in enumerate(cleaned):
+            hit = _cache.get(text)
+            if hit is None:
+                misses.append(i)
+            else:
+                _cache.move_to_end(text)
+                results[i] = hit
+    if not misses:
+        return results
+    
+    # Longest first, so each pipe batch holds similarly sized docs
+    order = sorted(misses, key=lambda i: len(cleaned[i]), reverse=True)
+    docs = get_nlp().pipe(
+        (cleaned[i] for i in order),
+        batch_size=SPACY_BATCH_SIZE,
+        n_process=SPACY_N_PROCESS,
+        disable=PREPROCESS_DISABLE,
+    )
     
+    for i, doc in zip(order, docs):
+        results[i] = filter_lemmas(doc, cleaned[i])
+    
+    _cache_store((cleaned[i], results[i]) for i in misses)
     return results
+
+
+def _cache_store(items) -> None:
+    """Add (cleaned text, result) pairs to the LRU, evicting the oldest entries."""
+    if PREPROCESS_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        for text, result in items:
+            if len(text) <= PREPROCESS_CACHE_MAX_LEN:
+                _cache[text] = result
+                _cache.move_to_end(text)
+        while len(_cache) > PREPROCESS_CACHE_SIZE:
+            _cache.popitem(last=False)
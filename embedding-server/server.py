@@ -8,23 +8,49 @@ Best-in-class for drift detection:
 - 22M params, ~5ms inference
 
 Run: uvicorn server:app --host 0.0.0.0 --port 8100
+CPU hosts: WORKERS=N uvicorn ... --workers N (EMBED_THREADS defaults to cores / N)
 """
 
 import os
 import sys
 import re
+import asyncio
+import base64
+import binascii
+import hashlib
 import logging
+import math
 import json
 import warnings
-from datetime import datetime, timezone
+from collections import OrderedDict
+import time
+
+# Intra-op threads for the encoder. OpenMP/MKL read their env vars when torch
+# and numpy are first imported, so these are set before those imports.
+# Unless set, the cores are split between the worker processes (WORKERS for
+# the Docker image, WEB_CONCURRENCY for gunicorn), so N workers don't each
+# start a full-size thread pool and oversubscribe the CPU
+_WORKERS = max(int(os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY") or 1), 1)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS") or max((os.cpu_count() or 1) // _WORKERS, 1))
+os.environ.setdefault("OMP_NUM_THREADS", str(EMBED_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(EMBED_THREADS))
+
+import numpy as np
 import torch
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import orjson
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from typing import Annotated, Literal
+from pydantic import AliasChoices, BaseModel, BeforeValidator, Field, WrapValidator
 from sentence_transformers import SentenceTransformer
-from contextlib import asynccontextmanager
-from preprocessing import preprocess, nlp_full
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from batching import EmbeddingBatcher
+from preprocessing import preprocess_batch, get_nlp
 from nlp_analysis import (
-    analyze_message as nlp_analyze_message,
+    analyze_texts,
+    overlap_entities,
+    MessageAnalysis,
     extract_weighted_entities,
     calculate_entity_overlap,
     should_suppress_anaphoric_floor,
@@ -40,9 +66,21 @@ warnings.filterwarnings("ignore", message="resource_tracker:.*semaphore")
 class StructuredFormatter(logging.Formatter):
     """JSON structured logging formatter for production."""
 
+    # (second, formatted) swapped as one tuple so threads never see a mismatch
+    _cached = (-1, "")
+
+    def _timestamp(self, created: float) -> str:
+        """ISO-8601 UTC timestamp; the date/time part is rebuilt once per second."""
+        second = int(created)
+        cached_second, prefix = self._cached
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cached = (second, prefix)
+        return f"{prefix}.{int((created - second) * 1_000_000):06d}Z"
+
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
             "module": record.module,
@@ -65,10 +103,16 @@ class ConsoleFormatter(logging.Formatter):
         "RESET": "\033[0m",
     }
 
+    _cached = (-1, "")
+
     def format(self, record: logging.LogRecord) -> str:
         color = self.COLORS.get(record.levelname, "")
         reset = self.COLORS["RESET"]
-        time_str = datetime.now().strftime("%H:%M:%S")
+        second = int(record.created)
+        cached_second, time_str = self._cached
+        if second != cached_second:
+            time_str = time.strftime("%H:%M:%S", time.localtime(second))
+            self._cached = (second, time_str)
 
         # Compact single-line format
         msg = f"{color}{time_str}{reset} {record.getMessage()}"
@@ -109,31 +153,306 @@ logger = setup_logging()
 # Default to paraphrase-MiniLM-L6-v2 - proven best for drift detection
 DEFAULT_MODEL = "sentence-transformers/paraphrase-MiniLM-L6-v2"
 
+# "torch" (sentence-transformers) or "onnx" (INT8 ONNX Runtime, CPU only)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
 # Global model reference
-model: SentenceTransformer | None = None
+model: "SentenceTransformer | OnnxEncoder | None" = None
+# Fixed once the model is loaded; read per request instead of re-querying
+model_name = os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+device = "cpu"
+dimension = 0
+batcher: EmbeddingBatcher | None = None
+# spaCy work (preprocessing, entity analysis) runs here instead of on the event
+# loop. One thread: calls share one pipeline and its StringStore, and the
+# encoder already keeps the other cores busy
+nlp_executor: ThreadPoolExecutor | None = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Load model on startup."""
-    global model
+async def run_nlp(fn, *args):
+    """Run a spaCy-bound call on nlp_executor and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(nlp_executor, fn, *args)
 
-    model_name = os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
-    device = "mps" if torch.backends.mps.is_available() else "cpu"
 
-    logger.info(f"Loading model on {device}", extra={"model": model_name, "device": device})
+# Sub-batch size inside one coalesced encode. Both backends sort texts by
+# length first, so sub-batches only pad to their own longest text
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    """Encode a coalesced batch (runs on a worker thread)."""
+    # inference_mode is thread-local, so it is entered here on the worker thread.
+    # It also skips the view/version tracking no_grad still does
+    with torch.inference_mode(), _autocast():
+        embeddings = model.encode(texts, batch_size=ENCODE_BATCH_SIZE)
+    # float32 out even from an fp16 model, so the cache and responses stay uniform
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+# Embeddings of recently seen texts, keyed by a 16-byte blake2b digest of the
+# (preprocessed) text - cheaper than sha256 and half the key memory, with
+# collision odds still negligible at cache scale.
+# Drift checks resend the same anchor every turn, so most of those skip the model
+EMB_CACHE_SIZE = int(os.getenv("EMB_CACHE_SIZE", "10000"))
+_embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+cache_hits = 0
+cache_misses = 0
+_pending_embeddings: dict[bytes, asyncio.Future] = {}
+# Strong references to running shared encodes (the loop only holds weak ones)
+_encode_tasks: set[asyncio.Task] = set()
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+async def _encode_shared(texts: list[str], futures: dict[bytes, asyncio.Future]) -> None:
+    """
+    Encode texts and resolve their pending futures, in order.
+
+    Runs as its own task rather than inside the request that started it, so a
+    cancelled request (client disconnect) doesn't take down every request
+    waiting on the same texts.
+    """
+    try:
+        fresh = await batcher.submit(texts)
+    except Exception as exc:
+        # Fail everyone waiting
+        for key, future in futures.items():
+            del _pending_embeddings[key]
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved when nobody else is waiting
+        return
+    except asyncio.CancelledError:
+        # Only the task itself being cancelled (shutdown) cancels the waiters
+        for key, future in futures.items():
+            del _pending_embeddings[key]
+            future.cancel()
+        raise
+    for (key, future), row in zip(futures.items(), fresh):
+        # Copy so the cache doesn't pin the whole batch array
+        row = row.copy()
+        future.set_result(row)
+        del _pending_embeddings[key]
+        if EMB_CACHE_SIZE > 0:
+            _embedding_cache[key] = row
+    while len(_embedding_cache) > EMB_CACHE_SIZE:
+        _embedding_cache.popitem(last=False)
+
+
+async def embed_texts(texts: list[str]) -> np.ndarray:
+    """Embed texts, serving repeats from the cache and batching only the misses."""
+    global cache_hits, cache_misses
+
+    keys = [_cache_key(t) for t in texts]
+    rows = []
+    misses = []
+    for i, key in enumerate(keys):
+        row = _embedding_cache.get(key)
+        if row is not None:
+            _embedding_cache.move_to_end(key)
+        else:
+            misses.append(i)
+        rows.append(row)
+    cache_hits += len(texts) - len(misses)
+    cache_misses += len(misses)
+
+    # A text already being encoded - by a concurrent request or earlier in this
+    # one - is awaited rather than sent again. That covers the common case of
+    # concurrent drift checks sharing one anchor
+    owned: dict[bytes, int] = {}
+    waiting: list[tuple[int, asyncio.Future | None]] = []
+    for i in misses:
+        pending = _pending_embeddings.get(keys[i])
+        if pending is not None:
+            waiting.append((i, pending))
+        elif keys[i] in owned:
+            waiting.append((i, None))
+        else:
+            owned[keys[i]] = i
+
+    if owned:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in owned}
+        _pending_embeddings.update(futures)
+        task = asyncio.create_task(_encode_shared([texts[i] for i in owned.values()], futures))
+        _encode_tasks.add(task)
+        task.add_done_callback(_encode_tasks.discard)
+        waiting[:0] = [(i, futures[key]) for key, i in owned.items()]
+
+    # Shared futures are awaited through shield(): cancelling this request must
+    # not cancel what other requests are waiting on
+    for i, pending in waiting:
+        rows[i] = await asyncio.shield(pending) if pending is not None else rows[owned[keys[i]]]
+
+    if not rows:
+        return np.empty((0, dimension), dtype=np.float32)
+    return np.stack(rows)
+
+
+def round_significant(embeddings: np.ndarray, digits: int) -> np.ndarray:
+    """Round each value to `digits` significant digits (as float64, so it prints short)."""
+    magnitude = np.abs(embeddings.astype(np.float64))
+    exponent = np.floor(np.log10(np.where(magnitude > 0, magnitude, 1.0)))
+    scale = 10.0 ** np.clip(digits - 1 - exponent, 0, 22)
+    return np.round(embeddings * scale) / scale
+
 
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, list[float]]:
+    """Symmetric per-row int8 quantization; returns (values, per-row scales)."""
+    scales = np.abs(embeddings).max(axis=1, keepdims=True) / 127
+    scales[scales == 0] = 1.0
+    quantized = np.round(embeddings / scales).astype(np.int8)
+    return quantized, scales.ravel().tolist()
+
+
+# /similarity multiplier, indexed by "text1 asks a question and text2 doesn't"
+QUESTION_ADJUST = (1.0, 1.3)
+
+
+def pair_similarity(embeddings: np.ndarray) -> float:
+    """Cosine similarity of a 2-row embedding array as one NumPy dot on unit rows."""
+    norms = np.linalg.norm(embeddings, axis=1)
+    unit = embeddings / np.maximum(norms, 1e-8)[:, None]
+    return float(unit[0] @ unit[1])
+
+
+# fp16 weights on mps/cuda (torch backend only)
+EMBED_FP16 = os.getenv("EMBED_FP16", "1") == "1"
+
+# Token limit per text, both backends. Batches already pad only to their
+# longest text, so this caps the cost of long inputs; lowering it (e.g. 64 for
+# short chat turns) truncates them. Can't exceed the model's own limit
+MAX_SEQ_LEN = int(os.getenv("MAX_SEQ_LEN", "128"))
+
+# Opt-in bfloat16 autocast on CPU (torch backend). Only faster on CPUs with
+# native bf16 matmuls (AVX-512 BF16 / AMX); elsewhere it emulates and is slower
+EMBED_CPU_BF16 = os.getenv("EMBED_CPU_BF16", "0") == "1"
+
+
+def _autocast():
+    """Autocast context for the torch encode; a no-op unless EMBED_CPU_BF16 applies."""
+    if EMBED_CPU_BF16 and EMBEDDING_BACKEND == "torch" and device == "cpu":
+        return torch.autocast(device_type="cpu", dtype=torch.bfloat16)
+    return nullcontext()
+
+
+# Opt-in torch.compile of the transformer (torch backend only)
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "0") == "1"
+
+
+def _compile_model(st_model: SentenceTransformer) -> None:
+    """
+    torch.compile the underlying HF model and warm it up at startup.
+
+    Compilation is lazy, so a few dummy batches of different sizes are encoded
+    here to keep the compile cost off real requests. Falls back to eager if
+    compiling fails.
+    """
+    if device == "mps":
+        logger.warning("TORCH_COMPILE is not supported on mps, running eager")
+        return
+
+    transformer = st_model[0]
+    eager = transformer.auto_model
+    mode = "reduce-overhead" if device == "cuda" else "default"
+    transformer.auto_model = torch.compile(eager, mode=mode, dynamic=True)
+    try:
+        # Same grad mode as _encode, so the warmed graphs are the ones reused
+        with torch.inference_mode():
+            for batch in (1, 2, 8, ENCODE_BATCH_SIZE):
+                st_model.encode(["warmup sentence for the compiler"] * batch, batch_size=batch)
+    except Exception:
+        logger.warning("torch.compile failed, running eager", exc_info=True)
+        transformer.auto_model = eager
+        return
+    logger.info("Encoder compiled", extra={"mode": mode})
+
+
+def _load_model() -> None:
+    """Load the encoder for EMBEDDING_BACKEND and set the model/device globals."""
+    global model, device
+
+    if EMBEDDING_BACKEND == "onnx":
+        from onnx_encoder import OnnxEncoder
+
+        device = "cpu"
+        logger.info("Loading ONNX model (int8)", extra={"model": model_name, "device": device})
+        model = OnnxEncoder(
+            model_name,
+            cache_dir=os.getenv("ONNX_CACHE_DIR"),
+            max_seq_length=MAX_SEQ_LEN,
+            threads=EMBED_THREADS,
+        )
+        return
+
+    if torch.cuda.is_available():
+        device = "cuda"
+    elif torch.backends.mps.is_available():
+        device = "mps"
+    else:
+        device = "cpu"
+    logger.info(f"Loading model on {device}", extra={"model": model_name, "device": device})
     model = SentenceTransformer(
         model_name,
         trust_remote_code=True,
         device=device,
     )
+    model.eval()
+    model.max_seq_length = min(MAX_SEQ_LEN, model.max_seq_length)
+    # Half precision halves weight bandwidth on GPUs; CPU fp16 kernels are slow
+    if EMBED_FP16 and device in ("mps", "cuda"):
+        model.half()
+        logger.info("Using fp16 weights", extra={"device": device})
+    if TORCH_COMPILE:
+        _compile_model(model)
+
+
+def _timed(label: str, load):
+    """Run a startup load and log how long it took."""
+    start = time.perf_counter()
+    result = load()
+    logger.info(f"{label} ({time.perf_counter() - start:.2f}s)")
+    return result
 
-    dim = model.get_sentence_embedding_dimension()
-    logger.info(f"Model ready (dim={dim})", extra={"dimension": dim})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load model on startup."""
+    global model, dimension, batcher, nlp_executor
+
+    torch.set_num_threads(EMBED_THREADS)
+    try:
+        # The batcher runs one encode at a time, so extra inter-op threads
+        # would only oversubscribe the cores the intra-op pool is using
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Only settable before torch starts any parallel work
+    logger.info(f"Using {EMBED_THREADS} encoder threads", extra={"threads": EMBED_THREADS})
+
+    # The embedding model and spaCy load in parallel on worker threads; both
+    # are mostly file I/O and native code, so startup takes the slower of the two
+    start = time.perf_counter()
+    _, nlp = await asyncio.gather(
+        asyncio.to_thread(_timed, "Model ready", _load_model),
+        asyncio.to_thread(_timed, "spaCy pipeline ready", get_nlp),
+    )
+    dimension = model.get_sentence_embedding_dimension()
+    logger.info(
+        f"Startup loads done in {time.perf_counter() - start:.2f}s (dim={dimension})",
+        extra={"dimension": dimension, "pipeline": nlp.meta.get("name")},
+    )
+
+    batcher = EmbeddingBatcher(_encode)
+    batcher.start()
+    nlp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spacy")
 
     yield
 
+    await batcher.stop()
+    batcher = None
+    nlp_executor.shutdown(wait=False, cancel_futures=True)
+    nlp_executor = None
     model = None
 
 
@@ -142,12 +461,31 @@ app = FastAPI(
     version="0.2.0",
     description="Paraphrase-MiniLM-L6-v2 optimized for drift detection",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
+def _as_list(value):
+    """Accept a bare string wherever a list of texts is expected."""
+    return [value] if isinstance(value, str) else value
+
+
+# "texts", or the original "text" key (string or list) that existing clients send
+TextsField = Annotated[
+    list[str],
+    BeforeValidator(_as_list),
+    Field(validation_alias=AliasChoices("texts", "text")),
+]
+
+
 class EmbedRequest(BaseModel):
-    text: str | list[str]
+    texts: TextsField
     preprocess: bool = True  # Default ON - preprocessing improves drift detection
+    # fp16: ~4 significant digits (JSON) / float16 bytes (raw)
+    # int8: symmetric per-row quantization; embedding ~= value * scales[row]
+    precision: Literal["fp32", "fp16", "int8"] = Field(
+        "fp32", validation_alias=AliasChoices("precision", "output_dtype")
+    )
 
 
 class EmbedResponse(BaseModel):
@@ -155,6 +493,8 @@ class EmbedResponse(BaseModel):
     dimension: int
     model: str
     preprocessed_texts: list[str] | None = None
+    precision: str = "fp32"
+    scales: list[float] | None = None  # int8 only
 
 
 class SimilarityRequest(BaseModel):
@@ -187,7 +527,7 @@ class DriftResponse(BaseModel):
 
 
 class PreprocessRequest(BaseModel):
-    text: str | list[str]
+    texts: TextsField
 
 
 class PreprocessResponse(BaseModel):
@@ -200,12 +540,19 @@ class HealthResponse(BaseModel):
     model: str
     device: str
     dimension: int
+    embedding_cache_hits: int = 0
+    embedding_cache_misses: int = 0
+    encode_batches: int = 0
+    mean_batch_size: float = 0.0
 
 
 class EntityOverlapRequest(BaseModel):
     """Check if two texts share significant entities/nouns."""
     text1: str
     text2: str
+    # False skips sorting: each list keeps extraction order (NER spans, noun
+    # chunks, then words, each in text order); shared follows text1's order
+    sort_entities: bool = True
 
 
 class EntityOverlapResponse(BaseModel):
@@ -239,12 +586,39 @@ class AnalyzeMessageResponse(BaseModel):
     entity_overlap: EntityOverlap
 
 
+def _as_vector(value, handler) -> np.ndarray:
+    """
+    A JSON float list, or base64 of little-endian float32 bytes, as a 1-D array.
+    
+    The base64 form skips pydantic's per-element float validation and the
+    list -> ndarray copy: np.frombuffer reads the decoded bytes in place.
+    """
+    if isinstance(value, str):
+        try:
+            vector = np.frombuffer(base64.b64decode(value, validate=True), dtype="<f4")
+        except (binascii.Error, ValueError) as exc:
+            raise ValueError("expected base64-encoded float32 bytes") from exc
+    else:
+        vector = np.asarray(handler(value), dtype=np.float64)
+    if vector.ndim != 1:
+        raise ValueError("expected a 1-D vector")
+    return vector
+
+
+# Embedding vector: a list of floats, or a base64 string of float32 bytes
+VectorField = Annotated[list[float] | str, WrapValidator(_as_vector)]
+
+
 class AnalyzeDriftRequest(BaseModel):
     """Full drift analysis with similarity calculation and boost application."""
     current: str
     previous: str
-    current_embedding: list[float]
-    branch_centroid: list[float]
+    current_embedding: VectorField
+    branch_centroid: VectorField
+    # Set when the caller already sends unit-length vectors (e.g. /embed
+    # output, or a centroid it renormalized), so their norms are skipped
+    current_embedding_normalized: bool = False
+    branch_centroid_normalized: bool = False
 
 
 class AnalyzeDriftResponse(BaseModel):
@@ -255,27 +629,77 @@ class AnalyzeDriftResponse(BaseModel):
     analysis: AnalyzeMessageResponse
 
 
-@app.post("/embed", response_model=EmbedResponse)
-async def embed(request: EmbedRequest):
-    """Generate embeddings for text(s)."""
+async def _embed_request(request: EmbedRequest) -> tuple[np.ndarray, list[str] | None]:
+    """Shared body of /embed and /embed/raw: optional preprocessing, then encode."""
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
-    texts = [request.text] if isinstance(request.text, str) else request.text
+    texts = request.texts
     
     # Optionally preprocess
     preprocessed_texts = None
     if request.preprocess:
-        texts = [preprocess(t) for t in texts]
+        texts = await run_nlp(preprocess_batch, texts)
         preprocessed_texts = texts
     
-    embeddings = model.encode(texts)
+    embeddings = await embed_texts(texts)
+    return np.ascontiguousarray(embeddings, dtype=np.float32), preprocessed_texts
+
+
+@app.post("/embed", response_model=EmbedResponse)
+async def embed(request: EmbedRequest):
+    """Generate embeddings for text(s)."""
+    embeddings, preprocessed_texts = await _embed_request(request)
+    dim = embeddings.shape[1]
+    
+    scales = None
+    if request.precision == "fp16":
+        # orjson has no float16 support; rounding to float16's ~4 significant
+        # digits gives the same precision and short decimals on the wire
+        embeddings = round_significant(embeddings, 4)
+    elif request.precision == "int8":
+        embeddings, scales = quantize_int8(embeddings)
     
-    return EmbedResponse(
-        embeddings=embeddings.tolist(),
-        dimension=embeddings.shape[1],
-        model=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL),
-        preprocessed_texts=preprocessed_texts,
+    # orjson serializes the array directly - no N x dim list of Python floats
+    # via tolist()
+    return Response(
+        content=orjson.dumps(
+            {
+                "embeddings": embeddings,
+                "dimension": dim,
+                "model": model_name,
+                "preprocessed_texts": preprocessed_texts,
+                "precision": request.precision,
+                "scales": scales,
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        ),
+        media_type="application/json",
+    )
+
+
+@app.post("/embed/raw")
+async def embed_raw(request: EmbedRequest):
+    """
+    Generate embeddings as raw little-endian bytes.
+    
+    Decode with np.frombuffer(body, dtype=X-Dtype).reshape(X-Shape). For int8
+    the rows are followed by one float32 scale per row.
+    """
+    embeddings, _ = await _embed_request(request)
+    rows, dim = embeddings.shape
+    if request.precision == "fp16":
+        content, dtype = embeddings.astype("<f2").tobytes(), "float16"
+    elif request.precision == "int8":
+        quantized, scales = quantize_int8(embeddings)
+        content = quantized.tobytes() + np.asarray(scales, dtype="<f4").tobytes()
+        dtype = "int8"
+    else:
+        content, dtype = embeddings.astype("<f4", copy=False).tobytes(), "float32"
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"X-Shape": f"{rows},{dim}", "X-Dtype": dtype},
     )
 
 
@@ -285,32 +709,23 @@ async def similarity(request: SimilarityRequest):
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
-    text1, text2 = request.text1, request.text2
+    raw1, raw2 = request.text1, request.text2
+    text1, text2 = raw1, raw2
     preprocessed_text1, preprocessed_text2 = None, None
     
     # Optionally preprocess
     if request.preprocess:
-        text1 = preprocess(text1)
-        text2 = preprocess(text2)
+        text1, text2 = await run_nlp(preprocess_batch, [text1, text2])
         preprocessed_text1 = text1
         preprocessed_text2 = text2
     
-    embeddings = model.encode([text1, text2])
+    embeddings = await embed_texts([text1, text2])
     
     # Cosine similarity
-    sim = float(torch.nn.functional.cosine_similarity(
-        torch.tensor(embeddings[0]).unsqueeze(0),
-        torch.tensor(embeddings[1]).unsqueeze(0),
-    ))
-
-    has_question1 = '?' in request.text1
-    has_question2 = '?' in request.text2
+    sim = pair_similarity(embeddings)
 
-    if has_question1 and not has_question2:
-        adjusted_similarity = sim * 1.3
-    else:
-        adjusted_similarity = sim
-    
+    # Question answered by a statement: bool comparison indexes the multiplier
+    adjusted_similarity = sim * QUESTION_ADJUST[('?' in raw1) > ('?' in raw2)]
     
     return SimilarityResponse(
         similarity=sim,
@@ -337,17 +752,13 @@ async def check_drift(request: DriftRequest):
     preprocessed_anchor, preprocessed_message = None, None
     
     if request.preprocess:
-        anchor = preprocess(anchor)
-        message = preprocess(message)
+        anchor, message = await run_nlp(preprocess_batch, [anchor, message])
         preprocessed_anchor = anchor
         preprocessed_message = message
     
-    embeddings = model.encode([anchor, message])
+    embeddings = await embed_texts([anchor, message])
     
-    sim = float(torch.nn.functional.cosine_similarity(
-        torch.tensor(embeddings[0]).unsqueeze(0),
-        torch.tensor(embeddings[1]).unsqueeze(0),
-    ))
+    sim = pair_similarity(embeddings)
     
     # Determine action based on thresholds
     if sim > request.stay_threshold:
@@ -368,8 +779,8 @@ async def check_drift(request: DriftRequest):
 @app.post("/preprocess", response_model=PreprocessResponse)
 async def preprocess_text(request: PreprocessRequest):
     """Preprocess text(s) without embedding."""
-    texts = [request.text] if isinstance(request.text, str) else request.text
-    preprocessed = [preprocess(t) for t in texts]
+    texts = request.texts
+    preprocessed = await run_nlp(preprocess_batch, texts)
     
     return PreprocessResponse(
         original=texts,
@@ -385,9 +796,13 @@ async def health():
     
     return HealthResponse(
         status="healthy",
-        model=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL),
-        device="mps" if torch.backends.mps.is_available() else "cpu",
-        dimension=model.get_sentence_embedding_dimension(),
+        model=model_name,
+        device=device,
+        dimension=dimension,
+        embedding_cache_hits=cache_hits,
+        embedding_cache_misses=cache_misses,
+        encode_batches=batcher.batches,
+        mean_batch_size=batcher.texts / batcher.batches if batcher.batches else 0.0,
     )
 
 
@@ -399,34 +814,9 @@ async def entity_overlap(request: EntityOverlapRequest):
     Used to detect when a user reply references something from the previous message,
     e.g., "serpentine belt" -> "maybe the serpentine"
     """
-    def extract_entities(text: str) -> set[str]:
-        doc = nlp_full(text.lower())
-        entities = set()
-        
-        # Named entities
-        for ent in doc.ents:
-            entities.add(ent.text.lower())
-        
-        # Nouns and proper nouns (more than 3 chars to filter noise)
-        for token in doc:
-            if token.pos_ in ('NOUN', 'PROPN') and len(token.text) > 3:
-                entities.add(token.lemma_.lower())
-                entities.add(token.text.lower())  # Also add raw form
-        
-        # Noun chunks (compound nouns like "serpentine belt")
-        for chunk in doc.noun_chunks:
-            if len(chunk.text) > 3:
-                entities.add(chunk.text.lower())
-                # Add ALL words from chunk (not just nouns) - catches adjectives like "serpentine"
-                for token in chunk:
-                    if len(token.text) > 3 and not token.is_stop:
-                        entities.add(token.lemma_.lower())
-                        entities.add(token.text.lower())
-        
-        return entities
-    
-    entities1 = extract_entities(request.text1)
-    entities2 = extract_entities(request.text2)
+    # Ordered tuples, without repeats
+    ordered1, ordered2 = await run_nlp(overlap_entities, [request.text1, request.text2])
+    entities1, entities2 = frozenset(ordered1), frozenset(ordered2)
     
     shared = entities1 & entities2
     
@@ -437,13 +827,23 @@ async def entity_overlap(request: EntityOverlapRequest):
         # Score based on what fraction of the shorter text's entities are shared
         overlap_score = len(shared) / min(len(entities1), len(entities2)) if min(len(entities1), len(entities2)) > 0 else 0.0
     
-    return EntityOverlapResponse(
-        has_overlap=len(shared) > 0,
-        overlap_score=min(overlap_score, 1.0),
-        shared_entities=sorted(list(shared)),
-        text1_entities=sorted(list(entities1)),
-        text2_entities=sorted(list(entities2)),
-    )
+    if request.sort_entities:
+        # One sort of the union; each list filters it and keeps its order
+        ordered = sorted(entities1 | entities2)
+        shared_list = [e for e in ordered if e in shared]
+        text1_list = [e for e in ordered if e in entities1]
+        text2_list = [e for e in ordered if e in entities2]
+    else:
+        shared_list = [e for e in ordered1 if e in shared]
+        text1_list, text2_list = list(ordered1), list(ordered2)
+    
+    return ORJSONResponse({
+        "has_overlap": len(shared) > 0,
+        "overlap_score": min(overlap_score, 1.0),
+        "shared_entities": shared_list,
+        "text1_entities": text1_list,
+        "text2_entities": text2_list,
+    })
 
 
 # Patterns for analyze-message endpoint
@@ -469,7 +869,7 @@ SHORT_RESPONSE_MAX_WORDS = 3
 
 # Response particles - words that only make sense as direct responses
 # These indicate continuation regardless of embedding similarity
-RESPONSE_PARTICLES = {
+RESPONSE_PARTICLES = frozenset({
     # Affirmative
     'yes', 'yeah', 'yep', 'yup', 'ya', 'aye', 'sure', 'ok', 'okay', 'k',
     'absolutely', 'definitely', 'certainly', 'indeed', 'right', 'correct',
@@ -485,11 +885,48 @@ RESPONSE_PARTICLES = {
     'please', 'pls', 'plz', 'go', 'continue', 'more', 'next',
     # Discourse markers
     'well', 'so', 'anyway', 'alright', 'hmm', 'hm', 'oh', 'ah', 'uh',
-}
+})
 
 # Floor for response particles
 RESPONSE_PARTICLE_FLOOR = 0.55
 
+# Longest answer (in words) that still gets the Q&A pair boost
+QA_MAX_WORDS = 10
+
+
+def analysis_payload(
+    current: MessageAnalysis,
+    previous: MessageAnalysis,
+    *,
+    has_anaphoric_ref: bool,
+    has_topic_return_signal: bool,
+    overlap_score: float,
+    shared_entities: set[str],
+    include_preference: bool = True,
+) -> dict:
+    """
+    AnalyzeMessageResponse as a plain dict, for ORJSONResponse.
+    
+    The /analyze-* endpoints return these directly rather than building nested
+    models that FastAPI would validate and re-serialize on every turn;
+    response_model still documents the shape. Values are cast to the JSON
+    types the models declared, since orjson rejects NumPy scalars.
+    """
+    return {
+        "current_is_question": bool(current.is_question),
+        "previous_is_question": bool(previous.is_question),
+        "current_has_anaphoric_ref": bool(has_anaphoric_ref),
+        "has_topic_return_signal": bool(has_topic_return_signal),
+        "has_preference": bool(include_preference and current.has_preference),
+        "preferred_entity": current.preferred_entity if include_preference else None,
+        "rejected_entity": current.rejected_entity if include_preference else None,
+        "entity_overlap": {
+            "has_overlap": len(shared_entities) > 0,
+            "overlap_score": float(min(overlap_score, 1.0)),
+            "shared_entities": sorted(shared_entities),
+        },
+    }
+
 
 @app.post("/analyze-message", response_model=AnalyzeMessageResponse)
 async def analyze_message(request: AnalyzeMessageRequest):
@@ -499,160 +936,68 @@ async def analyze_message(request: AnalyzeMessageRequest):
     Returns all signals needed for contextual boost calculation.
     Uses advanced spaCy NLP analysis.
     """
-    current_doc = nlp_full(request.current)
-    previous_doc = nlp_full(request.previous)
-    
-    # Get full message analysis using new NLP module
-    current_analysis = nlp_analyze_message(current_doc, request.current)
-    previous_analysis = nlp_analyze_message(previous_doc, request.previous)
+    # Get full message analysis using new NLP module (cached by text)
+    current_analysis, previous_analysis = await run_nlp(
+        analyze_texts, [request.current, request.previous]
+    )
     
     # Calculate entity overlap
     overlap_score, shared_entities, _ = calculate_entity_overlap(
         current_analysis.all_entities, previous_analysis.all_entities
     )
     
-    return AnalyzeMessageResponse(
-        current_is_question=current_analysis.is_question,
-        previous_is_question=previous_analysis.is_question,
-        current_has_anaphoric_ref=current_analysis.has_anaphoric_ref or bool(ANAPHORIC_PATTERNS.search(request.current)),
+    return ORJSONResponse(analysis_payload(
+        current_analysis,
+        previous_analysis,
+        has_anaphoric_ref=current_analysis.has_anaphoric_ref or bool(ANAPHORIC_PATTERNS.search(request.current)),
         has_topic_return_signal=current_analysis.has_topic_pivot or bool(TOPIC_PIVOT_PATTERNS.search(request.current)),
-        has_preference=current_analysis.has_preference,
-        preferred_entity=current_analysis.preferred_entity,
-        rejected_entity=current_analysis.rejected_entity,
-        entity_overlap=EntityOverlap(
-            has_overlap=len(shared_entities) > 0,
-            overlap_score=min(overlap_score, 1.0),
-            shared_entities=sorted(list(shared_entities)),
-        ),
-    )
-
-
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    import numpy as np
-    a_arr = np.array(a)
-    b_arr = np.array(b)
-    dot = np.dot(a_arr, b_arr)
-    norm_a = np.linalg.norm(a_arr)
-    norm_b = np.linalg.norm(b_arr)
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return float(dot / (norm_a * norm_b))
+        overlap_score=overlap_score,
+        shared_entities=shared_entities,
+    ))
 
 
-@app.post("/analyze-drift", response_model=AnalyzeDriftResponse)
-async def analyze_drift(request: AnalyzeDriftRequest):
+def compute_boosts(
+    raw_similarity: float,
+    *,
+    is_response_particle: bool,
+    word_count: int,
+    current_is_question: bool,
+    previous_is_question: bool,
+    has_anaphoric_ref: bool,
+    suppress_anaphoric_floor: bool,
+    has_entity_overlap: bool,
+    overlap_score: float,
+) -> tuple[float, float, list[str]]:
     """
-    Full drift analysis: NLP analysis + similarity calculation + boost application.
-    
-    Uses advanced spaCy analysis including:
-    - Weighted entity extraction (NER types matter)
-    - Preference/comparison detection ("I prefer X to Y")
-    - Sentence-level analysis for compound messages
-    - Topic pivot detection
+    The /analyze-drift boost cascade over plain scalars.
     
-    Node.js just compares boosted_similarity against thresholds to make routing decisions.
+    Returns (boosted_similarity, boost_multiplier, boosts_applied). Kept free of
+    request/analysis objects so it is cheap to call and easy to check in isolation.
     """
-    # Run advanced NLP analysis on both messages
-    current_doc = nlp_full(request.current)
-    previous_doc = nlp_full(request.previous)
-    
-    # Get full message analysis
-    current_analysis = nlp_analyze_message(current_doc, request.current)
-    previous_analysis = nlp_analyze_message(previous_doc, request.previous)
-    
-    # Extract entities for overlap calculation
-    current_entities = current_analysis.all_entities
-    previous_entities = previous_analysis.all_entities
-    
-    # Calculate weighted entity overlap
-    overlap_score, shared_entities, new_entity_weight = calculate_entity_overlap(
-        current_entities, previous_entities
-    )
-    has_entity_overlap = len(shared_entities) > 0
-    
-    # Detect topic pivot/return signals
-    has_topic_pivot = current_analysis.has_topic_pivot or bool(TOPIC_PIVOT_PATTERNS.search(request.current))
-    
-    # Calculate raw similarity
-    raw_similarity = cosine_similarity(request.current_embedding, request.branch_centroid)
-    
-    # If preference detected ("I prefer X to Y"), this is a topic pivot
-    # User is explicitly comparing/switching topics
-    if current_analysis.has_preference:
-        return AnalyzeDriftResponse(
-            raw_similarity=raw_similarity,
-            boosted_similarity=raw_similarity,  # No boost - let it drift
-            boost_multiplier=1.0,
-            boosts_applied=['preference_detected'],
-            analysis=AnalyzeMessageResponse(
-                current_is_question=current_analysis.is_question,
-                previous_is_question=previous_analysis.is_question,
-                current_has_anaphoric_ref=current_analysis.has_anaphoric_ref,
-                has_topic_return_signal=has_topic_pivot,
-                has_preference=True,
-                preferred_entity=current_analysis.preferred_entity,
-                rejected_entity=current_analysis.rejected_entity,
-                entity_overlap=EntityOverlap(
-                    has_overlap=has_entity_overlap,
-                    overlap_score=min(overlap_score, 1.0),
-                    shared_entities=sorted(list(shared_entities)),
-                ),
-            ),
-        )
-    
-    # If topic pivot signal detected, DON'T apply boosts for current branch.
-    if has_topic_pivot:
-        return AnalyzeDriftResponse(
-            raw_similarity=raw_similarity,
-            boosted_similarity=raw_similarity,
-            boost_multiplier=1.0,
-            boosts_applied=[],
-            analysis=AnalyzeMessageResponse(
-                current_is_question=current_analysis.is_question,
-                previous_is_question=previous_analysis.is_question,
-                current_has_anaphoric_ref=current_analysis.has_anaphoric_ref,
-                has_topic_return_signal=has_topic_pivot,
-                entity_overlap=EntityOverlap(
-                    has_overlap=has_entity_overlap,
-                    overlap_score=min(overlap_score, 1.0),
-                    shared_entities=sorted(list(shared_entities)),
-                ),
-            ),
-        )
-    
-    # Apply boosts
     boosted = raw_similarity
     boosts_applied = []
     
     # Boost 0a: Response particle detection
     # Words like "No", "Yes", "Thanks", "Ok" only make sense as direct responses
-    words = [w.lower().strip('.,!?') for w in request.current.split()]
-    first_word = words[0] if words else ''
-    is_response_particle = first_word in RESPONSE_PARTICLES and len(words) <= 4
-    
     if is_response_particle:
         boosted = max(boosted, RESPONSE_PARTICLE_FLOOR)
         boosts_applied.append('response_particle')
     
     # Boost 0b: Ultra-short response (1-2 words) - almost always a direct response
     # "Automatically", "Tomorrow", "Maybe" - single word answers
-    elif len(words) <= 2 and not current_analysis.is_question:
+    elif word_count <= 2 and not current_is_question:
         boosted = max(boosted, SHORT_RESPONSE_FLOOR)
         boosts_applied.append('ultra_short_response')
     
     # Boost 1: Q&A pair (previous was question, current is answer)
     # BUT only for short-ish answers, not long new questions
-    if previous_analysis.is_question and not current_analysis.is_question and len(words) <= 10:
+    if previous_is_question and not current_is_question and word_count <= QA_MAX_WORDS:
         boosted *= QA_BOOST_FACTOR
         boosts_applied.append('qa_pair')
     
     # Boost 2: Anaphoric reference with smart floor suppression
-    if current_analysis.has_anaphoric_ref:
-        # Check if we should suppress the floor (topic pivot, preference, new entities)
-        suppress_floor = should_suppress_anaphoric_floor(current_analysis, previous_entities)
-        
-        if not suppress_floor:
+    if has_anaphoric_ref:
+        if not suppress_anaphoric_floor:
             # Apply full anaphoric floor
             boosted = max(boosted, ANAPHORIC_SIMILARITY_FLOOR)
             boosted *= ANAPHORIC_BOOST_FACTOR
@@ -663,7 +1008,7 @@ async def analyze_drift(request: AnalyzeDriftRequest):
             boosts_applied.append('anaphoric_ref_weak')
     
     # Boost 3: Follow-up question
-    if current_analysis.is_question:
+    if current_is_question:
         boosted *= RECENCY_BOOST_FACTOR
         boosts_applied.append('question')
     
@@ -679,24 +1024,139 @@ async def analyze_drift(request: AnalyzeDriftRequest):
     
     # Calculate total multiplier
     boost_multiplier = boosted / raw_similarity if raw_similarity > 0 else 1.0
+    # overlap_score can be a NumPy scalar, which orjson won't serialize
+    return float(boosted), float(boost_multiplier), boosts_applied
+
+
+def cosine_similarity(
+    a: np.ndarray,
+    b: np.ndarray,
+    a_normalized: bool = False,
+    b_normalized: bool = False,
+) -> float:
+    """Compute cosine similarity between two vectors, skipping known unit norms."""
+    # No dtype cast: base64 input stays a float32 view of the request bytes
+    a_arr = np.asarray(a)
+    b_arr = np.asarray(b)
+    # BLAS dots only; squared norms come from the same kernel as the product
+    squared = (1.0 if a_normalized else float(a_arr @ a_arr)) * (
+        1.0 if b_normalized else float(b_arr @ b_arr)
+    )
+    if squared == 0:
+        return 0.0
+    return float(a_arr @ b_arr) / math.sqrt(squared)
+
+
+@app.post("/analyze-drift", response_model=AnalyzeDriftResponse)
+async def analyze_drift(request: AnalyzeDriftRequest):
+    """
+    Full drift analysis: NLP analysis + similarity calculation + boost application.
     
-    return AnalyzeDriftResponse(
-        raw_similarity=raw_similarity,
-        boosted_similarity=boosted,
-        boost_multiplier=boost_multiplier,
-        boosts_applied=boosts_applied,
-        analysis=AnalyzeMessageResponse(
-            current_is_question=current_analysis.is_question,
-            previous_is_question=previous_analysis.is_question,
-            current_has_anaphoric_ref=current_analysis.has_anaphoric_ref,
-            has_topic_return_signal=has_topic_pivot,
-            has_preference=current_analysis.has_preference,
-            preferred_entity=current_analysis.preferred_entity,
-            rejected_entity=current_analysis.rejected_entity,
-            entity_overlap=EntityOverlap(
-                has_overlap=has_entity_overlap,
-                overlap_score=min(overlap_score, 1.0),
-                shared_entities=sorted(list(shared_entities)),
+    Uses advanced spaCy analysis including:
+    - Weighted entity extraction (NER types matter)
+    - Preference/comparison detection ("I prefer X to Y")
+    - Sentence-level analysis for compound messages
+    - Topic pivot detection
+    
+    Node.js just compares boosted_similarity against thresholds to make routing decisions.
+    """
+    # Run advanced NLP analysis on both messages. The previous message was
+    # usually the current one last turn, so it comes from the analysis cache
+    current_analysis, previous_analysis = await run_nlp(
+        analyze_texts, [request.current, request.previous]
+    )
+    
+    # Extract entities for overlap calculation
+    current_entities = current_analysis.all_entities
+    previous_entities = previous_analysis.all_entities
+    
+    # Calculate weighted entity overlap
+    overlap_score, shared_entities, new_entity_weight = calculate_entity_overlap(
+        current_entities, previous_entities
+    )
+    has_entity_overlap = len(shared_entities) > 0
+    
+    # Detect topic pivot/return signals
+    has_topic_pivot = current_analysis.has_topic_pivot or bool(TOPIC_PIVOT_PATTERNS.search(request.current))
+    
+    # Calculate raw similarity
+    raw_similarity = cosine_similarity(
+        request.current_embedding,
+        request.branch_centroid,
+        a_normalized=request.current_embedding_normalized,
+        b_normalized=request.branch_centroid_normalized,
+    )
+    
+    # If preference detected ("I prefer X to Y"), this is a topic pivot
+    # User is explicitly comparing/switching topics
+    if current_analysis.has_preference:
+        return ORJSONResponse({
+            "raw_similarity": raw_similarity,
+            "boosted_similarity": raw_similarity,  # No boost - let it drift
+            "boost_multiplier": 1.0,
+            "boosts_applied": ['preference_detected'],
+            "analysis": analysis_payload(
+                current_analysis,
+                previous_analysis,
+                has_anaphoric_ref=current_analysis.has_anaphoric_ref,
+                has_topic_return_signal=has_topic_pivot,
+                overlap_score=overlap_score,
+                shared_entities=shared_entities,
+            ),
+        })
+    
+    # If topic pivot signal detected, DON'T apply boosts for current branch.
+    if has_topic_pivot:
+        return ORJSONResponse({
+            "raw_similarity": raw_similarity,
+            "boosted_similarity": raw_similarity,
+            "boost_multiplier": 1.0,
+            "boosts_applied": [],
+            "analysis": analysis_payload(
+                current_analysis,
+                previous_analysis,
+                has_anaphoric_ref=current_analysis.has_anaphoric_ref,
+                has_topic_return_signal=has_topic_pivot,
+                overlap_score=overlap_score,
+                shared_entities=shared_entities,
+                include_preference=False,
             ),
+        })
+    
+    # Apply boosts
+    # The boosts only read the first word and compare the word count against
+    # small limits, so the split stops once it has passed the largest limit
+    words = request.current.split(maxsplit=QA_MAX_WORDS)
+    word_count = len(words)  # Exact up to QA_MAX_WORDS, QA_MAX_WORDS + 1 beyond
+    first_word = words[0].lower().strip('.,!?') if words else ''
+    
+    boosted, boost_multiplier, boosts_applied = compute_boosts(
+        raw_similarity,
+        is_response_particle=first_word in RESPONSE_PARTICLES and word_count <= 4,
+        word_count=word_count,
+        current_is_question=current_analysis.is_question,
+        previous_is_question=previous_analysis.is_question,
+        has_anaphoric_ref=current_analysis.has_anaphoric_ref,
+        # Check if we should suppress the floor (topic pivot, preference, new entities)
+        suppress_anaphoric_floor=(
+            current_analysis.has_anaphoric_ref
+            and should_suppress_anaphoric_floor(current_analysis, previous_entities)
         ),
+        has_entity_overlap=has_entity_overlap,
+        overlap_score=overlap_score,
     )
+    
+    return ORJSONResponse({
+        "raw_similarity": raw_similarity,
+        "boosted_similarity": boosted,
+        "boost_multiplier": boost_multiplier,
+        "boosts_applied": boosts_applied,
+        "analysis": analysis_payload(
+            current_analysis,
+            previous_analysis,
+            has_anaphoric_ref=current_analysis.has_anaphoric_ref,
+            has_topic_return_signal=has_topic_pivot,
+            overlap_score=overlap_score,
+            shared_entities=shared_entities,
+        ),
+    })
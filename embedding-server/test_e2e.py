@@ -7,26 +7,45 @@ Tests the full flow:
 2. Single/batch embeddings
 3. Preprocessing
 4. Similarity computation
-5. Drift detection with realistic scenarios
+5. Drift detection with realistic scenarios (plus a batched /embed parity check)
 6. Annotated conversation scenarios from manual_test_cases.json
+7. fp16/int8 embedding output from /embed and /embed/raw
+8. /analyze-drift with base64-encoded and pre-normalized vectors
+9. /entity-overlap ordering with and without sort_entities
 
-Run with server on localhost:8100:
+Needs requests and numpy (orjson is used for JSON when installed). Run with server on localhost:8100:
     python test_e2e.py
 
 Or specify custom host:
     python test_e2e.py --host http://localhost:8100
 
+Use --json-out to also write per-test results for CI:
+    python test_e2e.py --json-out e2e_results.json
+
 Use --test-data to run annotated scenario tests:
     python test_e2e.py --test-data /path/to/manual_test_cases.json
 """
 
 import argparse
+import base64
+import functools
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import ContextVar, copy_context
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ANSI colors
 GREEN = "\033[92m"
@@ -36,74 +55,237 @@ BLUE = "\033[94m"
 BOLD = "\033[1m"
 RESET = "\033[0m"
 
+_SECTION_BAR = f"{BOLD}{BLUE}{'─' * 50}{RESET}"
+
+# Server under test, set once in main(). Worker threads see it through the
+# copied context they run in (see run_concurrently and main)
+BASE_URL: ContextVar[str] = ContextVar("base_url")
+
+# One keep-alive connection pool for every call the suite makes. Sized for
+# the concurrent cases, so parallel requests don't open throwaway sockets
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+def post_json(path: str, payload: dict) -> requests.Response:
+    """POST payload as JSON to path on BASE_URL, encoded with orjson when it's installed."""
+    url = f"{BASE_URL.get()}{path}"
+    if orjson is None:
+        return SESSION.post(url, json=payload)
+    return SESSION.post(url, data=orjson.dumps(payload), headers={"Content-Type": "application/json"})
+
+
+def parse_json(resp: requests.Response) -> Any:
+    """Decode a JSON response body, with orjson when it's installed."""
+    return resp.json() if orjson is None else orjson.loads(resp.content)
+
+
+# Edge-case input, built once at import
+_LONG_TEXT = "This is a test. " * 100
+
+
+_current = threading.local()
+
+
+class SectionLogger:
+    """
+    Collects the lines one test prints and writes them out in one go.
+
+    Active for the thread that entered it; tests run side by side each get
+    their own, so their output never interleaves.
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def __enter__(self) -> "SectionLogger":
+        _current.logger = self
+        return self
+
+    def __exit__(self, *exc):
+        _current.logger = None
+
+    def flush(self):
+        if self.lines:
+            sys.stdout.write("\n".join(self.lines) + "\n")
+            sys.stdout.flush()
+
+
+def log(line: str = ""):
+    """Add a line to this thread's SectionLogger, or print it if there is none."""
+    logger = getattr(_current, "logger", None)
+    if logger is None:
+        print(line)
+    else:
+        logger.lines.append(line)
+
 
 def check(condition: bool, message: str) -> bool:
-    """Print pass/fail and return result."""
+    """Log pass/fail and return result."""
     if condition:
-        print(f"  {GREEN}✓{RESET} {message}")
+        log(f"  {GREEN}✓{RESET} {message}")
         return True
     else:
-        print(f"  {RED}✗{RESET} {message}")
+        log(f"  {RED}✗{RESET} {message}")
         return False
 
 
 def section(title: str):
-    """Print section header."""
-    print(f"\n{BOLD}{BLUE}{'─' * 50}{RESET}")
-    print(f"{BOLD}{BLUE}{title}{RESET}")
-    print(f"{BOLD}{BLUE}{'─' * 50}{RESET}")
+    """Log section header."""
+    log(f"\n{_SECTION_BAR}\n{BOLD}{BLUE}{title}{RESET}\n{_SECTION_BAR}")
+
+
+def run_concurrently(fn: Callable[[Any], Any], items: list) -> list[tuple[Any, Exception | None]]:
+    """
+    Call fn on every item at once, returning (result, error) pairs in input order.
+
+    Independent cases in a section are network-bound, so issuing them together
+    costs about one round trip instead of one per case. Checks are still
+    printed afterwards, in case order.
+    """
+    def attempt(item):
+        try:
+            return fn(item), None
+        except requests.exceptions.ConnectionError:
+            raise
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(len(items), 1)) as pool:
+        # Threads don't inherit context variables; each call gets a copy
+        futures = [pool.submit(copy_context().run, attempt, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """Embed texts (preprocessed) in one /embed call, as an (n, dim) array."""
+    resp = post_json("/embed", {"text": texts, "preprocess": True})
+    resp.raise_for_status()
+    return np.asarray(parse_json(resp)["embeddings"], dtype=np.float32)
+
+
+# --no-cache turns embed_one's memoization off, so every lookup hits the server
+EMBED_CACHE = True
+
+
+@functools.lru_cache(maxsize=512)
+def _embed_one_cached(base_url: str, text: str) -> tuple[float, ...]:
+    # base_url only keys the cache per server; embed() reads the same BASE_URL
+    return tuple(embed([text])[0].tolist())
+
+
+def embed_one(text: str) -> np.ndarray:
+    """
+    Embedding of a single text, memoized per process.
+
+    Anchors recur turn after turn, so repeats are served from the cache
+    instead of another /embed round trip.
+    """
+    if EMBED_CACHE:
+        return np.asarray(_embed_one_cached(BASE_URL.get(), text), dtype=np.float32)
+    return embed([text])[0]
+
+
+def decode_embeddings(resp: requests.Response) -> np.ndarray:
+    """
+    An /embed or /embed/raw response as a float32 (n, dim) array, whatever its
+    precision. int8 rows are scaled back by their per-row scales.
+    """
+    if resp.headers.get("X-Shape"):
+        rows, dim = map(int, resp.headers["X-Shape"].split(","))
+        dtype = resp.headers["X-Dtype"]
+        if dtype == "int8":
+            # rows x dim int8 values, then one little-endian float32 scale per row
+            values = np.frombuffer(resp.content, dtype=np.int8, count=rows * dim).reshape(rows, dim)
+            scales = np.frombuffer(resp.content, dtype="<f4", offset=rows * dim)
+            return values * scales[:, None]
+        return np.frombuffer(resp.content, dtype=np.dtype(dtype).newbyteorder("<")).reshape(rows, dim).astype(np.float32)
 
+    data = parse_json(resp)
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    if data.get("scales") is not None:
+        embeddings *= np.asarray(data["scales"], dtype=np.float32)[:, None]
+    return embeddings
 
-def test_health(base_url: str) -> bool:
+
+def embed_shape(payload: dict) -> tuple[requests.Response, tuple[int, ...] | None]:
+    """
+    POST payload to /embed/raw and read the X-Shape header, leaving the body
+    undecoded. For checks that only need to know how many rows came back.
+    """
+    resp = post_json("/embed/raw", payload)
+    shape = resp.headers.get("X-Shape")
+    return resp, tuple(map(int, shape.split(","))) if shape else None
+
+
+def unit_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length, so cosine similarities are plain dot products."""
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def drift_action(sim: float, stay_threshold: float = 0.38, branch_threshold: float = 0.15) -> str:
+    """The server's /drift decision rule, for checking it client-side."""
+    if sim > stay_threshold:
+        return "STAY"
+    if sim > branch_threshold:
+        return "BRANCH_SAME_CLUSTER"
+    return "BRANCH_NEW_CLUSTER"
+
+
+def test_health() -> bool:
     """Test health endpoint."""
     section("1. Health Check")
 
     try:
-        resp = requests.get(f"{base_url}/health")
-        data = resp.json()
-
-        passed = all([
-            check(resp.status_code == 200, "Status code is 200"),
-            check(data.get("status") == "healthy", f"Status: {data.get('status')}"),
-            check("paraphrase-MiniLM" in data.get("model", ""), f"Model: {data.get('model')}"),
-            check(data.get("dimension") == 384, f"Dimension: {data.get('dimension')}"),
-            check(data.get("device") in ["mps", "cpu", "cuda"], f"Device: {data.get('device')}"),
-        ])
+        resp = SESSION.get(f"{BASE_URL.get()}/health")
+        data = parse_json(resp)
+
+        status, model = data.get("status"), data.get("model", "")
+        dimension, device = data.get("dimension"), data.get("device")
+
+        passed = (
+            check(resp.status_code == 200, "Status code is 200")
+            and check(status == "healthy", f"Status: {status}")
+            and check("paraphrase-MiniLM" in model, f"Model: {model}")
+            and check(dimension == 384, f"Dimension: {dimension}")
+            and check(device in ["mps", "cpu", "cuda"], f"Device: {device}")
+        )
         return passed
     except Exception as e:
-        print(f"  {RED}✗ Failed: {e}{RESET}")
+        log(f"  {RED}✗ Failed: {e}{RESET}")
         return False
 
 
-def test_embed_single(base_url: str) -> bool:
+def test_embed_single() -> bool:
     """Test single text embedding."""
     section("2. Single Text Embedding")
 
     try:
-        resp = requests.post(f"{base_url}/embed", json={
+        resp = post_json("/embed", {
             "text": "Planning a trip to Paris next summer",
             "preprocess": True
         })
-        data = resp.json()
+        data = parse_json(resp)
 
         embeddings = data.get("embeddings", [])
-        passed = all([
-            check(resp.status_code == 200, "Status code is 200"),
-            check(len(embeddings) == 1, f"Got 1 embedding (got {len(embeddings)})"),
-            check(len(embeddings[0]) == 384, f"Embedding dimension: {len(embeddings[0])}"),
-            check(data.get("preprocessed_texts") is not None, "Preprocessing applied"),
-        ])
+        preprocessed = data.get("preprocessed_texts")
+        passed = (
+            check(resp.status_code == 200, "Status code is 200")
+            and check(len(embeddings) == 1, f"Got 1 embedding (got {len(embeddings)})")
+            and check(len(embeddings[0]) == 384, f"Embedding dimension: {len(embeddings[0])}")
+            and check(preprocessed is not None, "Preprocessing applied")
+        )
 
-        if data.get("preprocessed_texts"):
-            print(f"  {YELLOW}→ Preprocessed: \"{data['preprocessed_texts'][0]}\"{RESET}")
+        if preprocessed:
+            log(f"  {YELLOW}→ Preprocessed: \"{preprocessed[0]}\"{RESET}")
 
         return passed
     except Exception as e:
-        print(f"  {RED}✗ Failed: {e}{RESET}")
+        log(f"  {RED}✗ Failed: {e}{RESET}")
         return False
 
 
-def test_embed_batch(base_url: str) -> bool:
+def test_embed_batch() -> bool:
     """Test batch embedding."""
     section("3. Batch Embedding")
 
@@ -114,55 +296,51 @@ def test_embed_batch(base_url: str) -> bool:
     ]
 
     try:
-        resp = requests.post(f"{base_url}/embed", json={
-            "text": texts,
-            "preprocess": True
-        })
-        data = resp.json()
+        # Only the shape is checked, so skip decoding 3 x 384 floats
+        resp, shape = embed_shape({"text": texts, "preprocess": True})
 
-        embeddings = data.get("embeddings", [])
-        passed = all([
-            check(resp.status_code == 200, "Status code is 200"),
-            check(len(embeddings) == 3, f"Got 3 embeddings (got {len(embeddings)})"),
-            check(all(len(e) == 384 for e in embeddings), "All embeddings are 384-dim"),
-        ])
+        passed = (
+            check(resp.status_code == 200, "Status code is 200")
+            and check(shape is not None and shape[0] == 3, f"Got 3 embeddings (shape {shape})")
+            and check(shape is not None and shape[1] == 384, "All embeddings are 384-dim")
+        )
 
         return passed
     except Exception as e:
-        print(f"  {RED}✗ Failed: {e}{RESET}")
+        log(f"  {RED}✗ Failed: {e}{RESET}")
         return False
 
 
-def test_preprocess(base_url: str) -> bool:
+def test_preprocess() -> bool:
     """Test preprocessing endpoint."""
     section("4. Preprocessing")
 
     try:
-        resp = requests.post(f"{base_url}/preprocess", json={
+        resp = post_json("/preprocess", {
             "text": "Can you please help me understand how to renovate my kitchen?"
         })
-        data = resp.json()
+        data = parse_json(resp)
 
         original = data.get("original", [""])[0]
         preprocessed = data.get("preprocessed", [""])[0]
 
-        passed = all([
-            check(resp.status_code == 200, "Status code is 200"),
-            check(len(preprocessed) < len(original), "Text was shortened"),
-            check("please" not in preprocessed.lower(), "Removed 'please'"),
-            check("help" not in preprocessed.lower(), "Removed 'help'"),
-        ])
+        passed = (
+            check(resp.status_code == 200, "Status code is 200")
+            and check(len(preprocessed) < len(original), "Text was shortened")
+            and check("please" not in preprocessed.lower(), "Removed 'please'")
+            and check("help" not in preprocessed.lower(), "Removed 'help'")
+        )
 
-        print(f"  {YELLOW}→ Original: \"{original}\"{RESET}")
-        print(f"  {YELLOW}→ Preprocessed: \"{preprocessed}\"{RESET}")
+        log(f"  {YELLOW}→ Original: \"{original}\"{RESET}")
+        log(f"  {YELLOW}→ Preprocessed: \"{preprocessed}\"{RESET}")
 
         return passed
     except Exception as e:
-        print(f"  {RED}✗ Failed: {e}{RESET}")
+        log(f"  {RED}✗ Failed: {e}{RESET}")
         return False
 
 
-def test_similarity(base_url: str) -> bool:
+def test_similarity() -> bool:
     """Test similarity computation."""
     section("5. Similarity Computation")
 
@@ -181,18 +359,22 @@ def test_similarity(base_url: str) -> bool:
         },
     ]
 
+    def fetch(tc: dict) -> float:
+        resp = post_json("/similarity", {
+            "text1": tc["text1"],
+            "text2": tc["text2"],
+            "preprocess": True
+        })
+        return parse_json(resp).get("similarity", 0)
+
     all_passed = True
+    results = run_concurrently(fetch, test_cases)
 
-    for tc in test_cases:
+    for tc, (sim, error) in zip(test_cases, results):
         try:
-            resp = requests.post(f"{base_url}/similarity", json={
-                "text1": tc["text1"],
-                "text2": tc["text2"],
-                "preprocess": True
-            })
-            data = resp.json()
-
-            sim = data.get("similarity", 0)
+            if error:
+                raise error
+
             low, high = tc["expected_range"]
             in_range = low <= sim <= high
 
@@ -203,13 +385,32 @@ def test_similarity(base_url: str) -> bool:
             all_passed = all_passed and passed
 
         except Exception as e:
-            print(f"  {RED}✗ {tc['label']}: {e}{RESET}")
+            log(f"  {RED}✗ {tc['label']}: {e}{RESET}")
             all_passed = False
 
+    # Parity: both texts of every case embedded in ONE /embed call, with the
+    # row-wise cosines from one einsum, must agree with /similarity
+    try:
+        texts = [text for tc in test_cases for text in (tc["text1"], tc["text2"])]
+        embeddings = unit_rows(embed(texts))
+        sims = np.einsum("ij,ij->i", embeddings[0::2], embeddings[1::2])
+        mismatches = [
+            f"{tc['label']}: client sim={sim:.3f}"
+            for tc, (server_sim, error), sim in zip(test_cases, results, sims.tolist())
+            if not error and abs(sim - server_sim) > 1e-3
+        ]
+        passed = check(not mismatches, "Batched /embed + client-side cosine matches /similarity")
+        for mismatch in mismatches:
+            log(f"    {YELLOW}{mismatch}{RESET}")
+        all_passed = all_passed and passed
+    except Exception as e:
+        log(f"  {RED}✗ Batched parity: {e}{RESET}")
+        all_passed = False
+
     return all_passed
 
 
-def test_drift_detection(base_url: str) -> bool:
+def test_drift_detection() -> bool:
     """Test drift detection with realistic scenarios."""
     section("6. Drift Detection")
 
@@ -234,21 +435,26 @@ def test_drift_detection(base_url: str) -> bool:
         },
     ]
 
+    def fetch(tc: dict) -> tuple[str, float]:
+        resp = post_json("/drift", {
+            "anchor": anchor,
+            "message": tc["message"],
+            "preprocess": True,
+            "stay_threshold": 0.38,
+            "branch_threshold": 0.15
+        })
+        data = parse_json(resp)
+        return data.get("action", ""), data.get("similarity", 0)
+
     all_passed = True
+    results = run_concurrently(fetch, test_cases)
 
-    for tc in test_cases:
+    for tc, (outcome, error) in zip(test_cases, results):
         try:
-            resp = requests.post(f"{base_url}/drift", json={
-                "anchor": anchor,
-                "message": tc["message"],
-                "preprocess": True,
-                "stay_threshold": 0.38,
-                "branch_threshold": 0.15
-            })
-            data = resp.json()
-
-            action = data.get("action", "")
-            sim = data.get("similarity", 0)
+            if error:
+                raise error
+
+            action, sim = outcome
 
             passed = check(
                 action == tc["expected_action"],
@@ -256,18 +462,39 @@ def test_drift_detection(base_url: str) -> bool:
             )
 
             if action != tc["expected_action"]:
-                print(f"    {YELLOW}Expected: {tc['expected_action']}{RESET}")
+                log(f"    {YELLOW}Expected: {tc['expected_action']}{RESET}")
 
             all_passed = all_passed and passed
 
         except Exception as e:
-            print(f"  {RED}✗ {tc['label']}: {e}{RESET}")
+            log(f"  {RED}✗ {tc['label']}: {e}{RESET}")
             all_passed = False
 
+    # Parity: the anchor and every message embedded in ONE /embed call, with
+    # similarity and action worked out here, must agree with /drift
+    try:
+        embeddings = unit_rows(embed([anchor] + [tc["message"] for tc in test_cases]))
+        # Every message against the anchor in one matrix-vector product
+        sims = embeddings[1:] @ embeddings[0]
+        mismatches = []
+        for tc, (outcome, error), sim in zip(test_cases, results, sims.tolist()):
+            if error:
+                continue
+            action, server_sim = outcome
+            if abs(sim - server_sim) > 1e-3 or drift_action(sim) != action:
+                mismatches.append(f"{tc['label']}: client sim={sim:.3f} {drift_action(sim)}")
+        passed = check(not mismatches, "Batched /embed + client-side cosine matches /drift")
+        for mismatch in mismatches:
+            log(f"    {YELLOW}{mismatch}{RESET}")
+        all_passed = all_passed and passed
+    except Exception as e:
+        log(f"  {RED}✗ Batched parity: {e}{RESET}")
+        all_passed = False
+
     return all_passed
 
 
-def test_conversation_flow(base_url: str) -> bool:
+def test_conversation_flow() -> bool:
     """Test a realistic conversation flow simulating DriftOS usage."""
     section("7. Conversation Flow Simulation")
 
@@ -281,23 +508,31 @@ def test_conversation_flow(base_url: str) -> bool:
         ("big-drift", "Anyway, my cat has been acting weird lately"),
     ]
 
-    print(f"  Conversation simulation:")
+    log(f"  Conversation simulation:")
+
+    # Every pairwise similarity up front, from (cached) single-text embeddings
+    # and one matrix product; each turn then just looks its pair up
+    messages = [message for _, message in conversation]
+    embeddings = unit_rows(np.stack([embed_one(message) for message in messages]))
+    client_sims = embeddings @ embeddings.T
+    index = {message: i for i, message in enumerate(messages)}
 
     current_anchor = None
     all_passed = True
+    mismatches = []
 
     for msg_type, message in conversation:
         if msg_type == "root":
             current_anchor = message
-            print(f"  {BLUE}[ROOT]{RESET} {message}")
+            log(f"  {BLUE}[ROOT]{RESET} {message}")
             continue
 
-        resp = requests.post(f"{base_url}/drift", json={
+        resp = post_json("/drift", {
             "anchor": current_anchor,
             "message": message,
             "preprocess": True
         })
-        data = resp.json()
+        data = parse_json(resp)
 
         action = data.get("action", "")
         sim = data.get("similarity", 0)
@@ -313,80 +548,305 @@ def test_conversation_flow(base_url: str) -> bool:
             expected = "BRANCH_NEW_CLUSTER"
 
         icon = GREEN + "✓" + RESET if action == expected else RED + "✗" + RESET
-        print(f"  {icon} [{action}] (sim={sim:.3f}) {message[:50]}...")
+        log(f"  {icon} [{action}] (sim={sim:.3f}) {message[:50]}...")
 
         if action != expected:
-            print(f"    {YELLOW}Expected: {expected}{RESET}")
+            log(f"    {YELLOW}Expected: {expected}{RESET}")
             all_passed = False
 
+        client_sim = float(client_sims[index[current_anchor], index[message]])
+        if abs(client_sim - sim) > 1e-3:
+            mismatches.append(f"client sim={client_sim:.3f} for: {message[:50]}")
+
         # Update anchor if staying (simulating DriftOS behavior)
         if action == "STAY":
             current_anchor = message
 
-    return all_passed
+    passed = check(not mismatches, "embed_one + client-side cosine matches /drift")
+    for mismatch in mismatches:
+        log(f"    {YELLOW}{mismatch}{RESET}")
+
+    return all_passed and passed
 
 
-def test_edge_cases(base_url: str) -> bool:
+def test_edge_cases() -> bool:
     """Test edge cases and error handling."""
     section("8. Edge Cases")
 
+    inputs = [
+        ("Empty string", ""),
+        ("Long text", _LONG_TEXT),
+        ("Special characters", "Test with émojis 🎉 and spëcial châràctérs!!"),
+    ]
+
+    # (label, path, payload); the cases are independent, so they go out
+    # together. Each input goes through both the JSON /embed path and
+    # /embed/raw, whose shape header is checked without parsing floats
+    cases = [
+        (label, path, {"text": text})
+        for label, text in inputs
+        for path in ("/embed", "/embed/raw")
+    ]
+    cases.append(
+        ("Preprocessing disabled", "/embed", {"text": "Test without preprocessing", "preprocess": False})
+    )
+
+    def fetch(case: tuple[str, str, dict]) -> requests.Response:
+        _, path, payload = case
+        return post_json(path, payload)
+
+    all_passed = True
+
+    for (label, path, _), (resp, error) in zip(cases, run_concurrently(fetch, cases)):
+        try:
+            if error:
+                raise error
+
+            if label == "Preprocessing disabled":
+                passed = check(
+                    parse_json(resp).get("preprocessed_texts") is None,
+                    "Preprocessing can be disabled"
+                )
+            elif path == "/embed":
+                embeddings = parse_json(resp).get("embeddings", []) if resp.status_code == 200 else []
+                passed = check(
+                    len(embeddings) == 1 and len(embeddings[0]) == 384,
+                    f"{label} handled (/embed, status {resp.status_code})"
+                )
+            else:
+                shape = resp.headers.get("X-Shape")
+                passed = check(
+                    resp.status_code == 200 and shape == "1,384",
+                    f"{label} handled (/embed/raw, shape {shape})"
+                )
+            all_passed = all_passed and passed
+
+        except Exception as e:
+            log(f"  {RED}✗ {label}: {e}{RESET}")
+            all_passed = False
+
+    return all_passed
+
+
+def test_embed_precision() -> bool:
+    """Test fp16/int8 /embed and /embed/raw output against fp32."""
+    section("9. Embedding Precision")
+
+    texts = [
+        "Planning a trip to Paris next summer",
+        "The weather looks nice today",
+    ]
+
+    # (label, path, precision, minimum row cosine vs fp32)
+    cases = [
+        ("fp16 /embed", "/embed", "fp16", 0.999),
+        ("int8 /embed", "/embed", "int8", 0.99),
+        ("fp16 /embed/raw", "/embed/raw", "fp16", 0.999),
+        ("int8 /embed/raw", "/embed/raw", "int8", 0.99),
+    ]
+
+    def fetch(case: tuple[str, str, str, float]) -> requests.Response:
+        _, path, precision, _ = case
+        resp = post_json(path, {"text": texts, "preprocess": True, "precision": precision})
+        resp.raise_for_status()
+        return resp
+
     all_passed = True
 
-    # Empty string
     try:
-        resp = requests.post(f"{base_url}/embed", json={"text": ""})
-        passed = check(resp.status_code == 200, "Empty string handled")
-        all_passed = all_passed and passed
+        reference = unit_rows(embed(texts))
     except Exception as e:
-        print(f"  {RED}✗ Empty string: {e}{RESET}")
-        all_passed = False
+        log(f"  {RED}✗ fp32 reference: {e}{RESET}")
+        return False
+
+    results = run_concurrently(fetch, cases)
+
+    for (label, path, precision, minimum), (resp, error) in zip(cases, results):
+        try:
+            if error:
+                raise error
+
+            embeddings = decode_embeddings(resp)
+            sims = np.einsum("ij,ij->i", unit_rows(embeddings), reference)
+            passed = check(
+                embeddings.shape == reference.shape and sims.min() > minimum,
+                f"{label}: min cosine vs fp32 {sims.min():.4f} (> {minimum})"
+            )
+
+            if path == "/embed" and precision == "int8":
+                data = parse_json(resp)
+                values = np.asarray(data["embeddings"])
+                passed = (
+                    check(data.get("precision") == "int8", "int8 /embed: precision echoed")
+                    and check(len(data.get("scales") or []) == len(texts), "int8 /embed: one scale per row")
+                    and check(
+                        np.array_equal(values, np.round(values)) and np.abs(values).max() <= 127,
+                        "int8 /embed: values are integers in [-127, 127]"
+                    )
+                    and passed
+                )
+            elif path == "/embed/raw":
+                passed = check(
+                    resp.headers.get("X-Dtype") == ("float16" if precision == "fp16" else "int8"),
+                    f"{label}: X-Dtype {resp.headers.get('X-Dtype')}"
+                ) and passed
+
+            all_passed = all_passed and passed
 
-    # Very long text
+        except Exception as e:
+            log(f"  {RED}✗ {label}: {e}{RESET}")
+            all_passed = False
+
+    # output_dtype is an alias for precision: the same request under that key
+    # must return exactly what the int8 /embed case got
     try:
-        long_text = "This is a test. " * 100
-        resp = requests.post(f"{base_url}/embed", json={"text": long_text})
-        passed = check(resp.status_code == 200, "Long text handled")
+        canonical, error = results[1]
+        if error:
+            raise error
+        resp = post_json("/embed", {"text": texts, "preprocess": True, "output_dtype": "int8"})
+        resp.raise_for_status()
+        alias, expected = parse_json(resp), parse_json(canonical)
+        passed = check(
+            all(alias.get(key) == expected.get(key) for key in ("precision", "embeddings", "scales")),
+            f"output_dtype alias matches precision (precision={alias.get('precision')})"
+        )
         all_passed = all_passed and passed
     except Exception as e:
-        print(f"  {RED}✗ Long text: {e}{RESET}")
+        log(f"  {RED}✗ output_dtype alias: {e}{RESET}")
         all_passed = False
 
-    # Special characters
+    return all_passed
+
+
+def test_analyze_drift_vectors() -> bool:
+    """Test /analyze-drift vector encodings and normalized flags against plain float lists."""
+    section("10. Drift Analysis Vectors")
+
+    current = "What about granite instead?"
+    previous = "We're looking at quartz countertops for the kitchen."
+
     try:
-        resp = requests.post(f"{base_url}/embed", json={
-            "text": "Test with émojis 🎉 and spëcial châràctérs!!"
-        })
-        passed = check(resp.status_code == 200, "Special characters handled")
-        all_passed = all_passed and passed
+        vectors = embed([current, previous])
     except Exception as e:
-        print(f"  {RED}✗ Special chars: {e}{RESET}")
-        all_passed = False
+        log(f"  {RED}✗ Embeddings: {e}{RESET}")
+        return False
+
+    units = unit_rows(vectors.astype(np.float64))
+
+    def as_base64(vector: np.ndarray) -> str:
+        return base64.b64encode(np.ascontiguousarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+    # (label, vectors payload); the first is the reference the others must match
+    base = {"current": current, "previous": previous}
+    cases = [
+        ("JSON float lists", {
+            **base, "current_embedding": vectors[0].tolist(), "branch_centroid": vectors[1].tolist(),
+        }),
+        ("base64 float32", {
+            **base, "current_embedding": as_base64(vectors[0]), "branch_centroid": as_base64(vectors[1]),
+        }),
+        # Unit vectors flagged as such skip the server's norms; cosine ignores
+        # scale, so the scores must match the unflagged raw vectors
+        ("pre-normalized, flagged", {
+            **base,
+            "current_embedding": units[0].tolist(),
+            "branch_centroid": units[1].tolist(),
+            "current_embedding_normalized": True,
+            "branch_centroid_normalized": True,
+        }),
+    ]
+
+    def fetch(case: tuple[str, dict]) -> tuple[float, float]:
+        resp = post_json("/analyze-drift", case[1])
+        resp.raise_for_status()
+        data = parse_json(resp)
+        return data["raw_similarity"], data["boosted_similarity"]
+
+    results = run_concurrently(fetch, cases)
+    reference, error = results[0]
+    if error:
+        log(f"  {RED}✗ {cases[0][0]}: {error}{RESET}")
+        return False
+
+    all_passed = True
+
+    for (label, _), (scores, error) in zip(cases[1:], results[1:]):
+        try:
+            if error:
+                raise error
+
+            # float32 vs float64 arithmetic on the same float32 values
+            passed = check(
+                all(abs(a - b) <= 1e-5 for a, b in zip(scores, reference)),
+                f"{label}: raw={scores[0]:.5f} boosted={scores[1]:.5f} "
+                f"(float lists: {reference[0]:.5f}, {reference[1]:.5f})"
+            )
+            all_passed = all_passed and passed
+
+        except Exception as e:
+            log(f"  {RED}✗ {label}: {e}{RESET}")
+            all_passed = False
+
+    return all_passed
+
+
+def test_entity_overlap_order() -> bool:
+    """Test /entity-overlap list ordering with sort_entities on and off."""
+    section("11. Entity Overlap Ordering")
+
+    texts = {
+        "text1": "The serpentine belt on my car is squealing and the alternator light came on",
+        "text2": "Maybe the serpentine belt is slipping on the alternator pulley",
+    }
+    keys = ("shared_entities", "text1_entities", "text2_entities")
+
+    def fetch(sort_entities: bool) -> dict:
+        resp = post_json("/entity-overlap", {**texts, "sort_entities": sort_entities})
+        resp.raise_for_status()
+        return parse_json(resp)
 
-    # Preprocessing disabled
     try:
-        resp = requests.post(f"{base_url}/embed", json={
-            "text": "Test without preprocessing",
-            "preprocess": False
-        })
-        data = resp.json()
-        passed = check(
-            data.get("preprocessed_texts") is None,
-            "Preprocessing can be disabled"
+        (ordered, error), (unordered, unordered_error) = run_concurrently(fetch, [True, False])
+        if error or unordered_error:
+            raise error or unordered_error
+
+        shared = set(unordered["shared_entities"])
+        return (
+            check(bool(ordered["shared_entities"]), f"Shared entities: {ordered['shared_entities']}")
+            and check(
+                all(ordered[key] == sorted(ordered[key]) for key in keys),
+                "sort_entities=true: every list sorted"
+            )
+            and check(
+                all(set(unordered[key]) == set(ordered[key]) for key in keys),
+                "sort_entities=false: same entities as sorted"
+            )
+            and check(
+                unordered["shared_entities"] == [e for e in unordered["text1_entities"] if e in shared],
+                "sort_entities=false: shared entities in text1's extraction order"
+            )
         )
-        all_passed = all_passed and passed
     except Exception as e:
-        print(f"  {RED}✗ Preprocess disabled: {e}{RESET}")
-        all_passed = False
-
-    return all_passed
+        log(f"  {RED}✗ Failed: {e}{RESET}")
+        return False
 
 
 def main():
     parser = argparse.ArgumentParser(description="E2E test for DriftOS Embedding Server")
     parser.add_argument("--host", default="http://localhost:8100", help="Server URL")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-request every embedding instead of reusing earlier responses")
+    parser.add_argument("--jobs", type=int, default=8,
+                        help="Tests run at once after the health check (1 = one after another)")
+    parser.add_argument("--json-out", type=Path, metavar="PATH",
+                        help="Also write per-test results (name, pass, seconds) as JSON to PATH")
     args = parser.parse_args()
 
+    global EMBED_CACHE
+    EMBED_CACHE = not args.no_cache
+
     base_url = args.host.rstrip("/")
+    BASE_URL.set(base_url)
 
     print(f"\n{BOLD}DriftOS Embedding Server - End-to-End Test{RESET}")
     print(f"Target: {base_url}")
@@ -400,24 +860,67 @@ def main():
         ("Drift Detection", test_drift_detection),
         ("Conversation Flow", test_conversation_flow),
         ("Edge Cases", test_edge_cases),
+        ("Embedding Precision", test_embed_precision),
+        ("Drift Analysis Vectors", test_analyze_drift_vectors),
+        ("Entity Overlap Ordering", test_entity_overlap_order),
     ]
 
-    results = []
-    for name, test_fn in tests:
+    def run_test(test_fn) -> tuple[tuple[bool, float], SectionLogger]:
+        """Run one test with its output held back; ((passed, seconds), its logger)."""
+        start = time.perf_counter()
+        with SectionLogger() as logger:
+            try:
+                passed = test_fn()
+            except requests.exceptions.ConnectionError:
+                raise
+            except Exception as e:
+                log(f"  {RED}✗ Unexpected error: {e}{RESET}")
+                passed = False
+        return (passed, time.perf_counter() - start), logger
+
+    # The health check runs alone first; the rest are independent and run up
+    # to --jobs at a time. Each test's output is printed as one block as soon
+    # as it finishes; the summary keeps the order above
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
         try:
-            passed = test_fn(base_url)
-            results.append((name, passed))
+            name, test_fn = tests[0]
+            outcomes[name], logger = run_test(test_fn)
+            logger.flush()
+
+            # One throwaway encode, so first-call costs (lazy init, graph
+            # compile on MPS) don't land on whichever test happens to go first
+            post_json("/embed", {"text": ["warmup"]})
+
+            futures = {
+                pool.submit(copy_context().run, run_test, test_fn): name
+                for name, test_fn in tests[1:]
+            }
+            for future in as_completed(futures):
+                outcomes[futures[future]], logger = future.result()
+                logger.flush()
         except requests.exceptions.ConnectionError:
+            pool.shutdown(wait=False, cancel_futures=True)
             print(f"\n{RED}Connection failed! Is the server running at {base_url}?{RESET}")
             print(f"Start with: cd embedding-server && uvicorn server:app --port 8100")
             sys.exit(1)
-        except Exception as e:
-            print(f"  {RED}✗ Unexpected error: {e}{RESET}")
-            results.append((name, False))
 
     # Summary
     section("Summary")
 
+    results = [(name, outcomes[name][0]) for name, _ in tests]
+
+    if args.json_out:
+        # For CI: one record per test, in test order, without parsing the ANSI output
+        records = [
+            {"name": name, "pass": passed, "seconds": round(outcomes[name][1], 4)}
+            for name, passed in results
+        ]
+        if orjson is None:
+            args.json_out.write_text(json.dumps(records, indent=2))
+        else:
+            args.json_out.write_bytes(orjson.dumps(records, option=orjson.OPT_INDENT_2))
+
     passed_count = sum(1 for _, p in results if p)
     total = len(results)
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for shared in-flight encodes in server.embed_texts
+
+Concurrent requests for the same text share one encode. These check that a
+request dropping out (cancelled, e.g. by a client disconnect) never takes the
+other requests waiting on that encode down with it.
+
+No model or running server is needed: the batcher is swapped for a slow fake
+so requests overlap. Needs the server's requirements (it imports server.py).
+Run:
+    python test_embed_cache.py
+
+or under pytest.
+"""
+
+import asyncio
+
+import numpy as np
+
+import server
+
+
+class SlowBatcher:
+    """EmbeddingBatcher stand-in: one (len(text), 1) row per text after a delay."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls: list[list[str]] = []
+
+    async def submit(self, texts: list[str]) -> np.ndarray:
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.delay)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+def _use(batcher: SlowBatcher):
+    server.batcher = batcher
+    server.dimension = 2
+    server._embedding_cache.clear()
+    server._pending_embeddings.clear()
+
+
+async def _settle(task: asyncio.Task):
+    """Wait for a cancelled task to finish unwinding."""
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_waiter_survives_cancelled_owner():
+    async def run():
+        batcher = SlowBatcher()
+        _use(batcher)
+
+        owner = asyncio.create_task(server.embed_texts(["shared anchor"]))
+        await asyncio.sleep(0)  # owner starts the shared encode
+        waiter = asyncio.create_task(server.embed_texts(["shared anchor", "message"]))
+        await asyncio.sleep(0)  # waiter joins it
+        owner.cancel()
+
+        rows = await waiter
+        await _settle(owner)
+        assert owner.cancelled()
+        np.testing.assert_array_equal(rows, [[13.0, 1.0], [7.0, 1.0]])
+        # The anchor was still encoded once, by the cancelled owner's encode
+        assert batcher.calls == [["shared anchor"], ["message"]]
+        assert not server._pending_embeddings
+
+    asyncio.run(run())
+
+
+def test_owner_survives_cancelled_waiter():
+    async def run():
+        _use(SlowBatcher())
+
+        owner = asyncio.create_task(server.embed_texts(["shared anchor"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(server.embed_texts(["shared anchor"]))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        rows = await owner
+        await _settle(waiter)
+        np.testing.assert_array_equal(rows, [[13.0, 1.0]])
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for test in (test_waiter_survives_cancelled_owner, test_owner_survives_cancelled_waiter):
+        test()
+        print(f"ok  {test.__name__}")
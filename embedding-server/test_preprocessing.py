@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for preprocessing.clean_text
+
+clean_text output goes straight to nlp.pipe, which rejects anything longer
+than SPACY_MAX_LENGTH, so oversized input must come out truncated. No spaCy
+model is needed. Run:
+    python test_preprocessing.py
+
+or under pytest.
+"""
+
+from preprocessing import SPACY_MAX_LENGTH, clean_text
+
+
+def test_clean_text_truncates_long_input():
+    assert len(clean_text("word " * SPACY_MAX_LENGTH)) <= SPACY_MAX_LENGTH
+
+
+def test_clean_text_truncates_after_lowercasing():
+    # "İ".lower() is two code points, so the text doubles when lowercased
+    assert len(clean_text("İ" * SPACY_MAX_LENGTH)) <= SPACY_MAX_LENGTH
+
+
+if __name__ == "__main__":
+    for test in (test_clean_text_truncates_long_input, test_clean_text_truncates_after_lowercasing):
+        test()
+        print(f"ok  {test.__name__}")